@@ -1,7 +1,10 @@
+import atexit
 import json
 import logging
 import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -19,6 +22,11 @@ class DateTimeFormat:
     bp_co_long = "%Y-%m-%d %H:%M:%S"
 
 
+class LogOverflowPolicy:
+    drop_debug = "drop_debug"
+    block = "block"
+
+
 class ServiceEnv:
     local = "local"
     staging = "staging"
@@ -33,8 +41,23 @@ MYSQL_USER = os.getenv("MYSQL_USER", "")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
 MYSQL_PORT = int(os.getenv("MYSQL_PORT", 3306))
 MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
+# 0 keeps a single dedicated connection per MysqlClient
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", 0))
+MYSQL_POOL_MAX_IDLE_TIME = float(os.getenv("MYSQL_POOL_MAX_IDLE_TIME", 300))
+MYSQL_POOL_CHECKOUT_TIMEOUT = (
+    float(os.environ["MYSQL_POOL_CHECKOUT_TIMEOUT"])
+    if os.getenv("MYSQL_POOL_CHECKOUT_TIMEOUT")
+    else None
+)
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
+# overridden to point the clients at a local stand-in, see fetchCommits/benchmark.py
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+
+# above 0, records are formatted and written by a background thread through a
+# queue of that size
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 0))
+LOG_QUEUE_OVERFLOW = os.getenv("LOG_QUEUE_OVERFLOW", LogOverflowPolicy.drop_debug)
 
 
 class JsonFormatter(logging.Formatter):
@@ -45,6 +68,8 @@ class JsonFormatter(logging.Formatter):
             "logger": record.name,
             "message": record.getMessage(),
         }
+        # structured fields given with extra={"json_fields": {...}}
+        log_record.update(getattr(record, "json_fields", dict()))
         return json.dumps(log_record)
 
 
@@ -64,6 +89,8 @@ class LocalFormatter(logging.Formatter):
         color = LOG_COlORS.get(level, "")
         logger = record.name
         message = record.getMessage()
+        if hasattr(record, "json_fields"):
+            message = f"{message}\n{json.dumps(record.json_fields, indent=2)}"
 
         log_record = (
             f"\n{color}{timestamp}\n{level} from {logger}\n{message}{RESET_COLOR}"
@@ -72,7 +99,47 @@ class LocalFormatter(logging.Formatter):
         return log_record
 
 
-def get_logger(name="BP_logger", env: str = ENV):
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler on a bounded queue, with a policy for when it is full.
+
+    With LogOverflowPolicy.drop_debug, DEBUG records are dropped, and counted,
+    while the queue is full and the other records wait for room. With
+    LogOverflowPolicy.block, every record waits.
+    """
+
+    def __init__(self, log_queue: queue.Queue, overflow: str) -> None:
+        if overflow not in (LogOverflowPolicy.drop_debug, LogOverflowPolicy.block):
+            raise ValueError(f"unknown log queue overflow policy {overflow=}")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if self.overflow == LogOverflowPolicy.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno <= logging.DEBUG:
+                self.dropped += 1
+                return
+            self.queue.put(record)
+
+
+class DrainingQueueListener(QueueListener):
+    # the stop sentinel waits for room instead of failing on a full queue, so
+    # stop always writes every queued record
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def get_logger(
+    name="BP_logger",
+    env: str = ENV,
+    queue_size: int = LOG_QUEUE_SIZE,
+    overflow: str = LOG_QUEUE_OVERFLOW,
+):
     logger = logging.getLogger(name)
     if env == ServiceEnv.production:
         logger.setLevel(logging.INFO)
@@ -85,6 +152,15 @@ def get_logger(name="BP_logger", env: str = ENV):
             handler.setFormatter(JsonFormatter())
         else:
             handler.setFormatter(LocalFormatter())
+        if queue_size > 0:
+            # the caller only merges the message, the listener thread formats
+            # and writes it, then drains the queue at exit
+            listener = DrainingQueueListener(
+                queue.Queue(maxsize=queue_size), handler, respect_handler_level=True
+            )
+            listener.start()
+            atexit.register(listener.stop)
+            handler = BoundedQueueHandler(listener.queue, overflow=overflow)
         logger.addHandler(handler)
 
     return logger
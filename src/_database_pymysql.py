@@ -1,5 +1,11 @@
+import queue
+import threading
+import time
 import traceback
+from contextlib import contextmanager
+from functools import lru_cache
 from logging import Logger
+from typing import Callable, Iterator
 
 import pymysql.cursors
 
@@ -7,11 +13,116 @@ from _config import (
     MYSQL_DATABASE,
     MYSQL_HOST,
     MYSQL_PASSWORD,
+    MYSQL_POOL_CHECKOUT_TIMEOUT,
+    MYSQL_POOL_MAX_IDLE_TIME,
+    MYSQL_POOL_SIZE,
     MYSQL_PORT,
     MYSQL_USER,
     base_logger,
 )
 
+Connection = pymysql.Connection
+
+QUERY_TEMPLATE_CACHE_SIZE = 512
+COND_OPERATORS = {"eq": "=", "neq": "<>", "leq": "<=", "geq": ">=", "l": "<", "g": ">"}
+# (kind, column, number of IN placeholders) for each condition kept in the WHERE
+CondShape = tuple[tuple[str, str, int], ...]
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def cond_template(shape: CondShape) -> str:
+    cond = " WHERE 1 = 1 "
+    for kind, col, size in shape:
+        if kind == "null":
+            cond = cond + f" AND {col} IS NULL "
+        elif kind == "not_null":
+            cond = cond + f" AND {col} IS NOT NULL "
+        elif kind == "in":
+            cond = cond + f" AND {col} IN ({', '.join(['%s'] * size)})"
+        else:
+            cond = cond + f" AND {col} {COND_OPERATORS[kind]} %s"
+    return cond
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def select_template(
+    table_name: str,
+    select_col: tuple[str, ...],
+    shape: CondShape,
+    order_by: str,
+    ascending_order: bool,
+    paginated: bool,
+) -> str:
+    query = f"SELECT {', '.join(select_col) if select_col else '*'} FROM {table_name} "
+    query = query + cond_template(shape)
+    if order_by:
+        query = query + f" ORDER BY {order_by} {'ASC' if ascending_order else 'DESC'} "
+    if paginated:
+        query = query + " LIMIT %s OFFSET %s "
+    return query + ";"
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def seek_template(
+    table_name: str,
+    select_col: tuple[str, ...],
+    shape: CondShape,
+    key: tuple[str, ...],
+    after: bool,
+) -> str:
+    query = f"SELECT {', '.join(select_col) if select_col else '*'} FROM {table_name} "
+    query = query + cond_template(shape)
+    if after:
+        # (k1, k2) > (v1, v2) spelled out, so that the range can use the index
+        seek_ls = [
+            " AND ".join([f"{col} = %s" for col in key[:i]] + [f"{key[i]} > %s"])
+            for i in range(len(key))
+        ]
+        query = query + f" AND (({') OR ('.join(seek_ls)})) "
+    query = query + f" ORDER BY {', '.join([f'{col} ASC' for col in key])} "
+    return query + " LIMIT %s ;"
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def aggregate_template(
+    table_name: str,
+    aggregates: tuple[tuple[str, str], ...],
+    group_by: tuple[str, ...],
+    shape: CondShape,
+) -> str:
+    select_ls = list(group_by) + [f"{expr} AS {alias}" for alias, expr in aggregates]
+    query = f"SELECT {', '.join(select_ls)} FROM {table_name} "
+    query = query + cond_template(shape)
+    if group_by:
+        query = query + f" GROUP BY {', '.join(group_by)} "
+    return query + ";"
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def count_template(
+    table_name: str, select_col: tuple[str, ...], shape: CondShape
+) -> str:
+    query = f"SELECT COUNT({', '.join(select_col) if select_col else '*'}) AS ct FROM {table_name} "
+    return query + cond_template(shape) + ";"
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def delete_template(table_name: str, shape: CondShape) -> str:
+    return f"DELETE FROM {table_name} " + cond_template(shape) + ";"
+
+
+@lru_cache(maxsize=QUERY_TEMPLATE_CACHE_SIZE)
+def update_template(
+    table_name: str,
+    update_col_col: tuple[tuple[str, str], ...],
+    update_col_value: tuple[str, ...],
+    shape: CondShape,
+) -> str:
+    update_ls = [f" {col} = {other} " for col, other in update_col_col]
+    update_ls.extend([f" {col} = %s " for col in update_col_value])
+    query = f"UPDATE {table_name} SET {', '.join(update_ls)} "
+    return query + cond_template(shape) + ";"
+
 
 class MySqlNoConnectionError(Exception):
     def __init__(self):
@@ -38,8 +149,135 @@ class MySqlWrongQueryError(Exception):
         super().__init__(detail)
 
 
+class MySqlPoolExhaustedError(Exception):
+    def __init__(self, timeout: float | None):
+        super().__init__(f"No connection available in the pool after {timeout=}s.")
+
+
+class MysqlConnectionPool:
+    """Fixed-size thread-safe pool of database connections.
+
+    Connections are opened lazily, up to size. On checkout, a connection idle
+    for more than max_idle_time is replaced, and one idle for more than
+    ping_after is pinged first and replaced if the ping fails.
+
+    Parameters
+    ----------
+    connect : Callable[[], Connection]
+        Opens a new connection
+    size : int
+        Maximum number of connections open at the same time
+    max_idle_time : float
+        Seconds after which an idle connection is closed instead of reused
+    checkout_timeout : float | None, optional
+        Seconds to wait for a free connection, None waits forever, by default None
+    ping_after : float, optional
+        Seconds of idleness after which a connection is pinged on checkout, by default 1
+    logger : Logger | None, optional
+        Logger, by default base_logger
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Connection],
+        size: int,
+        max_idle_time: float,
+        checkout_timeout: float | None = None,
+        ping_after: float = 1.0,
+        logger: Logger | None = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError(f"pool size must be positive, got {size=}")
+        self.logger = logger if logger else base_logger
+        self.connect = connect
+        self.size = size
+        self.max_idle_time = max_idle_time
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+        self.idle: queue.LifoQueue[tuple[Connection, float]] = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def close_quietly(self, connection: Connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def checkout(self) -> Connection:
+        while True:
+            try:
+                connection, last_used = self.idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.max_idle_time:
+                self.logger.debug(f"closing connection idle for {idle_for:.0f}s")
+                self.close_quietly(connection)
+                continue
+            if idle_for > self.ping_after:
+                try:
+                    connection.ping(reconnect=False)
+                except Exception:
+                    self.logger.debug("closing connection failing its health check")
+                    self.close_quietly(connection)
+                    continue
+            return connection
+
+    def acquire(self) -> Connection:
+        if not self.slots.acquire(timeout=self.checkout_timeout):
+            self.logger.error("could not borrow a connection, pool exhausted")
+            raise MySqlPoolExhaustedError(timeout=self.checkout_timeout)
+        try:
+            return self.checkout()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, connection: Connection, broken: bool = False):
+        if not broken and connection.open:
+            # pymysql does not autocommit, so even a SELECT leaves a transaction
+            # open, whose REPEATABLE READ snapshot would hide from the next
+            # borrower the rows committed meanwhile by the other connections
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+        if broken or not connection.open:
+            self.close_quietly(connection)
+        else:
+            self.idle.put((connection, time.monotonic()))
+        self.slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Borrow a connection for the duration of the with block."""
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken=broken)
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self.close_quietly(connection)
+
+
 class MysqlClient:
-    def __init__(self, logger: Logger | None = None):
+    def __init__(
+        self,
+        logger: Logger | None = None,
+        pool_size: int = MYSQL_POOL_SIZE,
+        pool_max_idle_time: float = MYSQL_POOL_MAX_IDLE_TIME,
+        pool_checkout_timeout: float | None = MYSQL_POOL_CHECKOUT_TIMEOUT,
+    ):
         self.logger = logger if logger else base_logger
         self.connection: pymysql.Connection[pymysql.cursors.DictCursor] | None = None
         self.port = MYSQL_PORT
@@ -47,10 +285,22 @@ class MysqlClient:
         self.user = MYSQL_USER
         self.password = MYSQL_PASSWORD
         self.database = MYSQL_DATABASE
-        self.__connect()
+        # with a pool, every query borrows a connection and the client can be
+        # shared between threads
+        self.pool: MysqlConnectionPool | None = None
+        if pool_size > 0:
+            self.pool = MysqlConnectionPool(
+                connect=self.__new_connection,
+                size=pool_size,
+                max_idle_time=pool_max_idle_time,
+                checkout_timeout=pool_checkout_timeout,
+                logger=self.logger,
+            )
+        else:
+            self.__connect()
 
-    def __connect(self):
-        self.connection = pymysql.connect(
+    def __new_connection(self) -> Connection:
+        return pymysql.connect(
             host=self.host,
             port=self.port,
             user=self.user,
@@ -60,7 +310,33 @@ class MysqlClient:
             cursorclass=pymysql.cursors.DictCursor,
         )
 
+    def __connect(self):
+        self.connection = self.__new_connection()
+
+    @contextmanager
+    def borrow(self) -> Iterator[Connection]:
+        """Give the connection to use, borrowed from the pool if any.
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlPoolExhaustedError
+            If no pooled connection got free in time
+        """
+        if self.pool:
+            with self.pool.connection() as connection:
+                yield connection
+            return
+        if not self.connection:
+            self.logger.error("could not execute query, no connection to Database")
+            raise MySqlNoConnectionError()
+        yield self.connection
+
     def check_alive(self):
+        if self.pool:
+            # pooled connections are checked when borrowed
+            return
         try:
             try:
                 check_alive_res = self.execute("select 1;")
@@ -73,20 +349,10 @@ class MysqlClient:
             raise MySqlNoConnectionError()
 
     def logging(self, cursor):
-        self.logger.debug(f"MysqlClient executed: {str(cursor._executed)}")
-        self.logger.debug(f"{cursor.rowcount=}")
-
-    def obj_to_str(self, o) -> str:
-        if isinstance(o, int):
-            return str(o)
-        return f"'{o}'"
+        self.logger.debug("MysqlClient executed: %s", cursor._executed)
+        self.logger.debug("cursor.rowcount=%s", cursor.rowcount)
 
-    def ls_obj_to_str(self, ls: list) -> list:
-        if not ls:
-            return ls
-        return [self.obj_to_str(e) for e in ls]
-
-    def generate_cond(
+    def cond_shape(
         self,
         cond_null: list[str] = list(),
         cond_not_null: list[str] = list(),
@@ -97,41 +363,37 @@ class MysqlClient:
         cond_geq: dict[str, object] = dict(),
         cond_l: dict[str, object] = dict(),
         cond_g: dict[str, object] = dict(),
-    ) -> str:
-        cond = " WHERE 1 = 1 "
+    ) -> tuple[CondShape, tuple]:
+        """Split conditions into a hashable shape, used to cache the SQL
+        template, and the values bound to its placeholders.
+
+        Empty IN lists and falsy values are skipped, as they always were.
+        """
+        shape: list[tuple[str, str, int]] = list()
+        args: list = list()
         for col in cond_null:
-            cond = cond + f" AND {col} IS NULL "
+            shape.append(("null", col, 0))
         for col in cond_not_null:
-            cond = cond + f" AND {col} IS NOT NULL "
+            shape.append(("not_null", col, 0))
         for col, ls_val in cond_in.items():
             if not ls_val:
                 continue
-            cond = cond + f" AND {col} IN ({', '.join(self.ls_obj_to_str(ls_val))})"
-        for col, val in cond_eq.items():
-            if not val:
-                continue
-            cond = cond + f" AND {col} = {self.obj_to_str(val)}"
-        for col, val in cond_neq.items():
-            if not val:
-                continue
-            cond = cond + f" AND {col} <> {self.obj_to_str(val)}"
-        for col, val in cond_leq.items():
-            if not val:
-                continue
-            cond = cond + f" AND {col} <= {self.obj_to_str(val)}"
-        for col, val in cond_geq.items():
-            if not val:
-                continue
-            cond = cond + f" AND {col} >= {self.obj_to_str(val)}"
-        for col, val in cond_l.items():
-            if not val:
-                continue
-            cond = cond + f" AND {col} < {self.obj_to_str(val)}"
-        for col, val in cond_g.items():
-            if not val:
-                continue
-            cond = cond + f" AND {col} > {self.obj_to_str(val)}"
-        return cond
+            shape.append(("in", col, len(ls_val)))
+            args.extend(ls_val)
+        for kind, cond in (
+            ("eq", cond_eq),
+            ("neq", cond_neq),
+            ("leq", cond_leq),
+            ("geq", cond_geq),
+            ("l", cond_l),
+            ("g", cond_g),
+        ):
+            for col, val in cond.items():
+                if not val:
+                    continue
+                shape.append((kind, col, 0))
+                args.append(val)
+        return tuple(shape), tuple(args)
 
     def delete(
         self,
@@ -199,8 +461,7 @@ class MysqlClient:
             cond_null=cond_null,
             silent=True,
         )
-        query = f"DELETE FROM {table_name} "
-        query = query + self.generate_cond(
+        shape, args = self.cond_shape(
             cond_eq=cond_eq,
             cond_g=cond_g,
             cond_geq=cond_geq,
@@ -211,19 +472,22 @@ class MysqlClient:
             cond_not_null=cond_not_null,
             cond_null=cond_null,
         )
-        query = query + ";"
+        query = delete_template(table_name=table_name, shape=shape)
         try:
-            self.execute(query=query, silent=silent)
+            self.execute(query=query, args=args, silent=silent, commit=True)
         except MySqlWrongQueryError as e:
             self.logger.warning(
                 f"wrong query when updating by id, {traceback.format_exc()}"
             )
             raise e
-        self.connection.commit()  # type: ignore
         return res_mysql
 
     def execute(
-        self, query: str, args: tuple | dict | None = None, silent=False
+        self,
+        query: str,
+        args: tuple | dict | None = None,
+        silent=False,
+        commit=False,
     ) -> tuple[dict[str, object], ...]:
         """Execute a SQL query and return the results.
 
@@ -235,6 +499,8 @@ class MysqlClient:
             Parameters to pass to the query, by default None
         silent : bool, optional
             If True, suppress logging of the query execution, by default False
+        commit : bool, optional
+            If True, commit on the same connection after execution, by default False
 
         Returns
         -------
@@ -248,25 +514,441 @@ class MysqlClient:
         MySqlWrongQueryError
             If query is wrong
         """
-        if not self.connection:
-            self.logger.error("could not execute query, no connection to Database")
-            raise MySqlNoConnectionError()
-        with self.connection.cursor() as cursor:
-            try:
-                cursor.execute(query=query, args=args)
-                res = cursor.fetchall()
-            except pymysql.err.ProgrammingError as e:
-                self.logger.warning(
-                    f"error while executing query, {traceback.format_exc()}"
-                )
-                raise MySqlWrongQueryError(f"{type(e)=}, {str(e)=}")
-            if not silent:
-                self.logging(cursor)
+        with self.borrow() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute(query=query, args=args)
+                    res = cursor.fetchall()
+                except pymysql.err.ProgrammingError as e:
+                    self.logger.warning(
+                        f"error while executing query, {traceback.format_exc()}"
+                    )
+                    raise MySqlWrongQueryError(f"{type(e)=}, {str(e)=}")
+                if not silent:
+                    self.logging(cursor)
+            if commit:
+                connection.commit()
         return res
 
-    def count(
+    def execute_rowcount(
+        self,
+        query: str,
+        args: tuple | dict | None = None,
+        silent=False,
+        commit=False,
+    ) -> int:
+        """Execute a SQL statement and return its number of affected rows.
+
+        Parameters
+        ----------
+        query : str
+            SQL statement to execute, typically an UPDATE or a DELETE
+        args : tuple | dict | None, optional
+            Parameters to pass to the query, by default None
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+        commit : bool, optional
+            If True, commit on the same connection after execution, by default False
+
+        Returns
+        -------
+        int
+            Number of affected rows
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        with self.borrow() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    rowcount = cursor.execute(query=query, args=args)
+                except pymysql.err.ProgrammingError as e:
+                    self.logger.warning(
+                        f"error while executing query, {traceback.format_exc()}"
+                    )
+                    raise MySqlWrongQueryError(f"{type(e)=}, {str(e)=}")
+                if not silent:
+                    self.logging(cursor)
+            if commit:
+                connection.commit()
+        return rowcount
+
+    def executemany(
+        self, query: str, args: list[tuple], silent=False, commit=False
+    ) -> int:
+        """Execute a SQL query against every parameter tuple of args.
+
+        INSERT ... VALUES queries are rewritten by pymysql into multi-row
+        statements, so one call results in as few round trips as possible.
+
+        Parameters
+        ----------
+        query : str
+            SQL query to execute
+        args : list[tuple]
+            Sequence of parameters, one tuple per execution
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+        commit : bool, optional
+            If True, commit on the same connection after execution, by default False
+
+        Returns
+        -------
+        int
+            Number of affected rows
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        with self.borrow() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    rowcount = cursor.executemany(query=query, args=args)
+                except pymysql.err.ProgrammingError as e:
+                    self.logger.warning(
+                        f"error while executing query, {traceback.format_exc()}"
+                    )
+                    raise MySqlWrongQueryError(f"{type(e)=}, {str(e)=}")
+                if not silent:
+                    self.logging(cursor)
+            if commit:
+                connection.commit()
+        return rowcount if rowcount else 0
+
+    def stream(
+        self,
+        query: str,
+        args: tuple | dict | None = None,
+        chunk_size: int = 1000,
+        silent=False,
+    ) -> Iterator[tuple[dict[str, object], ...]]:
+        """Execute a SQL query on a server-side cursor and yield its rows by chunks.
+
+        Rows are read from the server as the chunks are consumed, so memory
+        stays bounded by chunk_size whatever the size of the result. The
+        connection is held until the generator is exhausted or closed; without
+        a pool, the client cannot run another query in the meantime.
+
+        Parameters
+        ----------
+        query : str
+            SQL query to execute
+        args : tuple | dict | None, optional
+            Parameters to pass to the query, by default None
+        chunk_size : int, optional
+            Maximum number of rows per yielded chunk, by default 1000
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+
+        Yields
+        ------
+        tuple
+            Next rows of the result, at most chunk_size of them
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size=}")
+        with self.borrow() as connection:
+            # closing an unbuffered cursor early drains what is left of the result
+            with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                try:
+                    cursor.execute(query=query, args=args)
+                except pymysql.err.ProgrammingError as e:
+                    self.logger.warning(
+                        f"error while executing query, {traceback.format_exc()}"
+                    )
+                    raise MySqlWrongQueryError(f"{type(e)=}, {str(e)=}")
+                if not silent:
+                    self.logger.debug("MysqlClient streaming: %s", cursor._executed)
+                n_rows = 0
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    n_rows += len(rows)
+                    yield tuple(rows)
+                if not silent:
+                    self.logger.debug(f"MysqlClient streamed {n_rows} rows")
+
+    def count(
+        self,
+        table_name: str,
+        select_col: list[str] = list(),
+        cond_null: list[str] = list(),
+        cond_not_null: list[str] = list(),
+        cond_in: dict[str, list] = dict(),
+        cond_eq: dict[str, object] = dict(),
+        cond_neq: dict[str, object] = dict(),
+        cond_leq: dict[str, object] = dict(),
+        cond_geq: dict[str, object] = dict(),
+        cond_l: dict[str, object] = dict(),
+        cond_g: dict[str, object] = dict(),
+        silent: bool = False,
+    ) -> int | None:
+        """Execute a SELECT COUNT(...) query with various conditions.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to query
+        select_col : list[str], optional
+            List of columns to include in the COUNT(...), by default all columns
+        cond_null : list[str], optional
+            Columns that must be NULL
+        cond_not_null : list[str], optional
+            Columns that must not be NULL
+        cond_in : dict[str, list], optional
+            Column values that must be in given list
+        cond_eq : dict[str, object], optional
+            Column values that must equal given value
+        cond_neq : dict[str, object], optional
+            Column values that must not equal given value
+        cond_leq : dict[str, object], optional
+            Column values that must be less than or equal to given value
+        cond_geq : dict[str, object], optional
+            Column values that must be greater than or equal to given value
+        cond_l : dict[str, object], optional
+            Column values that must be less than given value
+        cond_g : dict[str, object], optional
+            Column values that must be greater than given value
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+
+        Returns
+        -------
+        int
+            result of the count
+        None
+            if query went wrong
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        shape, args = self.cond_shape(
+            cond_eq=cond_eq,
+            cond_g=cond_g,
+            cond_geq=cond_geq,
+            cond_in=cond_in,
+            cond_l=cond_l,
+            cond_leq=cond_leq,
+            cond_neq=cond_neq,
+            cond_not_null=cond_not_null,
+            cond_null=cond_null,
+        )
+        query = count_template(
+            table_name=table_name, select_col=tuple(select_col), shape=shape
+        )
+
+        res_mysql = self.execute(query=query, args=args, silent=silent)
+        if not res_mysql:
+            return None
+        res = res_mysql[0].get("ct", None)
+        return int(str(res)) if res else None
+
+    def select(
+        self,
+        table_name: str,
+        select_col: list[str] = list(),
+        cond_null: list[str] = list(),
+        cond_not_null: list[str] = list(),
+        cond_in: dict[str, list] = dict(),
+        cond_eq: dict[str, object] = dict(),
+        cond_neq: dict[str, object] = dict(),
+        cond_leq: dict[str, object] = dict(),
+        cond_geq: dict[str, object] = dict(),
+        cond_l: dict[str, object] = dict(),
+        cond_g: dict[str, object] = dict(),
+        order_by: str = "",
+        ascending_order: bool = True,
+        limit: int = 0,
+        offset: int = 0,
+        silent: bool = False,
+    ) -> tuple[dict[str, object], ...]:
+        """Execute a SELECT query with various conditions.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to query
+        select_col : list[str], optional
+            List of columns to select, by default all columns
+        cond_null : list[str], optional
+            Columns that must be NULL
+        cond_not_null : list[str], optional
+            Columns that must not be NULL
+        cond_in : dict[str, list], optional
+            Column values that must be in given list
+        cond_eq : dict[str, object], optional
+            Column values that must equal given value
+        cond_neq : dict[str, object], optional
+            Column values that must not equal given value
+        cond_leq : dict[str, object], optional
+            Column values that must be less than or equal to given value
+        cond_geq : dict[str, object], optional
+            Column values that must be greater than or equal to given value
+        cond_l : dict[str, object], optional
+            Column values that must be less than given value
+        cond_g : dict[str, object], optional
+            Column values that must be greater than given value
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+        limit : int | None, optional
+            Maximum number of rows to return, 0 means alls, by default 0
+        offset : int | None, optional
+            Number of rows to skip before returning results, 0 means no offset, by default 0
+
+        Returns
+        -------
+        tuple
+            Query results as a tuple of dictionaries
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        shape, args = self.cond_shape(
+            cond_eq=cond_eq,
+            cond_g=cond_g,
+            cond_geq=cond_geq,
+            cond_in=cond_in,
+            cond_l=cond_l,
+            cond_leq=cond_leq,
+            cond_neq=cond_neq,
+            cond_not_null=cond_not_null,
+            cond_null=cond_null,
+        )
+        query = select_template(
+            table_name=table_name,
+            select_col=tuple(select_col),
+            shape=shape,
+            order_by=order_by,
+            ascending_order=ascending_order,
+            paginated=bool(limit),
+        )
+        if limit:
+            args = args + (limit, offset)
+
+        res_mysql = self.execute(query=query, args=args, silent=silent)
+        return res_mysql
+
+    def select_iter(
+        self,
+        table_name: str,
+        select_col: list[str] = list(),
+        cond_null: list[str] = list(),
+        cond_not_null: list[str] = list(),
+        cond_in: dict[str, list] = dict(),
+        cond_eq: dict[str, object] = dict(),
+        cond_neq: dict[str, object] = dict(),
+        cond_leq: dict[str, object] = dict(),
+        cond_geq: dict[str, object] = dict(),
+        cond_l: dict[str, object] = dict(),
+        cond_g: dict[str, object] = dict(),
+        order_by: str = "",
+        ascending_order: bool = True,
+        chunk_size: int = 1000,
+        silent: bool = False,
+    ) -> Iterator[dict[str, object]]:
+        """Lazily yield the rows of a SELECT query with various conditions.
+
+        Same as select, but the rows are streamed from a server-side cursor
+        chunk_size at a time instead of being loaded at once, see stream.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to query
+        select_col : list[str], optional
+            List of columns to select, by default all columns
+        cond_null : list[str], optional
+            Columns that must be NULL
+        cond_not_null : list[str], optional
+            Columns that must not be NULL
+        cond_in : dict[str, list], optional
+            Column values that must be in given list
+        cond_eq : dict[str, object], optional
+            Column values that must equal given value
+        cond_neq : dict[str, object], optional
+            Column values that must not equal given value
+        cond_leq : dict[str, object], optional
+            Column values that must be less than or equal to given value
+        cond_geq : dict[str, object], optional
+            Column values that must be greater than or equal to given value
+        cond_l : dict[str, object], optional
+            Column values that must be less than given value
+        cond_g : dict[str, object], optional
+            Column values that must be greater than given value
+        order_by : str, optional
+            Column to order the rows by, by default no order
+        ascending_order : bool, optional
+            If False, order the rows descending, by default True
+        chunk_size : int, optional
+            Number of rows fetched from the server at once, by default 1000
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+
+        Yields
+        ------
+        dict
+            Next row of the result
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        shape, args = self.cond_shape(
+            cond_eq=cond_eq,
+            cond_g=cond_g,
+            cond_geq=cond_geq,
+            cond_in=cond_in,
+            cond_l=cond_l,
+            cond_leq=cond_leq,
+            cond_neq=cond_neq,
+            cond_not_null=cond_not_null,
+            cond_null=cond_null,
+        )
+        query = select_template(
+            table_name=table_name,
+            select_col=tuple(select_col),
+            shape=shape,
+            order_by=order_by,
+            ascending_order=ascending_order,
+            paginated=False,
+        )
+        for rows in self.stream(
+            query=query, args=args, chunk_size=chunk_size, silent=silent
+        ):
+            yield from rows
+
+    def paginate(
         self,
         table_name: str,
+        key: str | list[str] = "id",
+        page_size: int = 1000,
         select_col: list[str] = list(),
         cond_null: list[str] = list(),
         cond_not_null: list[str] = list(),
@@ -278,15 +960,26 @@ class MysqlClient:
         cond_l: dict[str, object] = dict(),
         cond_g: dict[str, object] = dict(),
         silent: bool = False,
-    ) -> int | None:
-        """Execute a SELECT COUNT(...) query with various conditions.
+    ) -> Iterator[tuple[dict[str, object], ...]]:
+        """Walk a table page by page with keyset (seek) pagination.
+
+        Each page is fetched with WHERE key > last seen key ORDER BY key
+        LIMIT page_size, so that, unlike LIMIT/OFFSET, the cost of a page does
+        not grow with its depth as long as key is indexed.
 
         Parameters
         ----------
         table_name : str
             Name of the table to query
+        key : str | list[str], optional
+            Column, or columns of a composite key such as
+            ["committedDate", "id"], the pages are ordered by. The key must be
+            unique, by default "id"
+        page_size : int, optional
+            Maximum number of rows per page, by default 1000
         select_col : list[str], optional
-            List of columns to include in the COUNT(...), by default all columns
+            List of columns to select, by default all columns. The key columns
+            are added if missing
         cond_null : list[str], optional
             Columns that must be NULL
         cond_not_null : list[str], optional
@@ -308,12 +1001,10 @@ class MysqlClient:
         silent : bool, optional
             If True, suppress logging of the query execution, by default False
 
-        Returns
-        -------
-        int
-            result of the count
-        None
-            if query went wrong
+        Yields
+        ------
+        tuple
+            Next page of rows, ordered by key
 
         Raises
         ------
@@ -322,8 +1013,14 @@ class MysqlClient:
         MySqlWrongQueryError
             If query is wrong
         """
-        query = f"SELECT COUNT({', '.join(select_col) if select_col else '*'}) AS ct FROM {table_name} "
-        query = query + self.generate_cond(
+        if page_size < 1:
+            raise ValueError(f"page_size must be positive, got {page_size=}")
+        key_col = (key,) if isinstance(key, str) else tuple(key)
+        if not key_col:
+            raise ValueError("paginate needs at least one key column")
+        if select_col:
+            select_col = select_col + [col for col in key_col if col not in select_col]
+        shape, cond_args = self.cond_shape(
             cond_eq=cond_eq,
             cond_g=cond_g,
             cond_geq=cond_geq,
@@ -334,18 +1031,32 @@ class MysqlClient:
             cond_not_null=cond_not_null,
             cond_null=cond_null,
         )
-        query = query + ";"
-
-        res_mysql = self.execute(query=query, silent=silent)
-        if not res_mysql:
-            return None
-        res = res_mysql[0].get("ct", None)
-        return int(str(res)) if res else None
 
-    def select(
+        last: tuple | None = None
+        while True:
+            query = seek_template(
+                table_name=table_name,
+                select_col=tuple(select_col),
+                shape=shape,
+                key=key_col,
+                after=last is not None,
+            )
+            args = cond_args
+            if last is not None:
+                for i in range(len(key_col)):
+                    args = args + last[: i + 1]
+            page = self.execute(query=query, args=args + (page_size,), silent=silent)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            last = tuple(page[-1][col] for col in key_col)
+
+    def aggregate(
         self,
         table_name: str,
-        select_col: list[str] = list(),
+        aggregates: dict[str, str],
+        group_by: list[str] = list(),
         cond_null: list[str] = list(),
         cond_not_null: list[str] = list(),
         cond_in: dict[str, list] = dict(),
@@ -355,20 +1066,19 @@ class MysqlClient:
         cond_geq: dict[str, object] = dict(),
         cond_l: dict[str, object] = dict(),
         cond_g: dict[str, object] = dict(),
-        order_by: str = "",
-        ascending_order: bool = True,
-        limit: int = 0,
-        offset: int = 0,
         silent: bool = False,
     ) -> tuple[dict[str, object], ...]:
-        """Execute a SELECT query with various conditions.
+        """Execute a SELECT of aggregate expressions, optionally grouped.
 
         Parameters
         ----------
         table_name : str
             Name of the table to query
-        select_col : list[str], optional
-            List of columns to select, by default all columns
+        aggregates : dict[str, str]
+            Dictionary mapping result aliases to aggregate expressions, such
+            as {"newest": "MAX(committedDate)"}
+        group_by : list[str], optional
+            Columns to group by, also returned in each row, by default no grouping
         cond_null : list[str], optional
             Columns that must be NULL
         cond_not_null : list[str], optional
@@ -389,15 +1099,11 @@ class MysqlClient:
             Column values that must be greater than given value
         silent : bool, optional
             If True, suppress logging of the query execution, by default False
-        limit : int | None, optional
-            Maximum number of rows to return, 0 means alls, by default 0
-        offset : int | None, optional
-            Number of rows to skip before returning results, 0 means no offset, by default 0
 
         Returns
         -------
         tuple
-            Query results as a tuple of dictionaries
+            One dictionary per group, a single one without group_by
 
         Raises
         ------
@@ -406,10 +1112,9 @@ class MysqlClient:
         MySqlWrongQueryError
             If query is wrong
         """
-        query = (
-            f"SELECT {', '.join(select_col) if select_col else '*'} FROM {table_name} "
-        )
-        query = query + self.generate_cond(
+        if not aggregates:
+            raise ValueError("aggregate needs at least one aggregate expression")
+        shape, args = self.cond_shape(
             cond_eq=cond_eq,
             cond_g=cond_g,
             cond_geq=cond_geq,
@@ -420,17 +1125,54 @@ class MysqlClient:
             cond_not_null=cond_not_null,
             cond_null=cond_null,
         )
-        if order_by:
-            query = (
-                query + f" ORDER BY {order_by} {'ASC' if ascending_order else 'DESC'} "
-            )
-        if limit:
-            query = query + f" LIMIT {limit} "
-            query = query + f" OFFSET {offset} "
-        query = query + ";"
+        query = aggregate_template(
+            table_name=table_name,
+            aggregates=tuple(aggregates.items()),
+            group_by=tuple(group_by),
+            shape=shape,
+        )
+        return self.execute(query=query, args=args, silent=silent)
 
-        res_mysql = self.execute(query=query, silent=silent)
-        return res_mysql
+    def has_index(self, table_name: str, columns: list[str], silent=False) -> bool:
+        """Tell whether an index of the table starts with the given columns.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to inspect
+        columns : list[str]
+            Columns the index must start with, in that order
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+
+        Returns
+        -------
+        bool
+            True if such an index exists in the current database
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        """
+        res_mysql = self.execute(
+            query="""
+            SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX;
+            """,
+            args=(table_name,),
+            silent=silent,
+        )
+        indexes: dict[str, list[str]] = dict()
+        for row in res_mysql:
+            indexes.setdefault(str(row["INDEX_NAME"]), list()).append(
+                str(row["COLUMN_NAME"])
+            )
+        return any(
+            index_columns[: len(columns)] == columns
+            for index_columns in indexes.values()
+        )
 
     def select_by_id(
         self,
@@ -507,10 +1249,11 @@ class MysqlClient:
                 f"wrong query when deleting by id, {traceback.format_exc()}"
             )
             raise e
-        self.connection.commit()  # type: ignore
         return res_mysql[0] if res_mysql else dict()
 
     def close(self):
+        if self.pool:
+            self.pool.close()
         if self.connection:
             self.connection.close()
 
@@ -554,14 +1297,109 @@ class MysqlClient:
         """
         try:
             self.execute(
-                query=query, args=tuple(v for v in values.values()), silent=silent
+                query=query,
+                args=tuple(v for v in values.values()),
+                silent=silent,
+                commit=True,
             )
         except MySqlWrongQueryError:
             self.logger.warning(
                 f"wrong query when inserting one, {traceback.format_exc()}"
             )
             raise
-        self.connection.commit()  # type: ignore
+
+    def insert_many(
+        self,
+        table_name: str,
+        rows: list[dict[str, object]] | list[tuple],
+        batch_size: int = 1000,
+        silent=False,
+        or_ignore=False,
+        on_duplicate: list[str] = list(),
+        columns: list[str] = list(),
+    ) -> list[int]:
+        """Insert several rows into a database table, one commit per batch.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to insert into
+        rows : list[dict[str, object]] | list[tuple]
+            Rows to insert, all sharing the columns of the first row, or
+            tuples of values in the order of columns
+        batch_size : int, optional
+            Maximum number of rows sent and committed at once, by default 1000
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+        or_ignore : bool, optional
+            If True, use INSERT IGNORE, default False
+        on_duplicate : list[str], optional
+            Columns overwritten with the inserted value when the row already
+            exists (ON DUPLICATE KEY UPDATE), by default none
+        columns : list[str], optional
+            Columns of the values when rows are tuples, which are then sent
+            as is, by default the keys of the first row
+
+        Returns
+        -------
+        list[int]
+            Number of affected rows for each batch
+
+        Raises
+        ------
+        NoValueInsertionError
+            If rows is empty or its first row has no values
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        if not rows or not rows[0]:
+            self.logger.warning("could not insert many, no values given")
+            raise MySqlNoValueInsertionError()
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size=}")
+        if isinstance(rows[0], tuple) and not columns:
+            raise ValueError("columns must be given when rows are tuples")
+
+        columns = columns if columns else list(rows[0])
+        query = f"""
+        INSERT {"IGNORE" if or_ignore else ""} INTO {table_name}
+        ({", ".join(columns)})
+        VALUES ({", ".join(["%s"]*len(columns))})
+        """
+        if on_duplicate:
+            query = query + " ON DUPLICATE KEY UPDATE "
+            query = query + ", ".join(
+                [f"{col} = VALUES({col})" for col in on_duplicate]
+            )
+
+        batch_counts: list[int] = list()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            args = [
+                row if isinstance(row, tuple) else tuple(row[col] for col in columns)
+                for row in batch
+            ]
+            try:
+                cnt = self.executemany(
+                    query=query, args=args, silent=silent, commit=True
+                )
+            except MySqlWrongQueryError:
+                self.logger.warning(
+                    f"wrong query when inserting many, {traceback.format_exc()}"
+                )
+                raise
+            batch_counts.append(cnt)
+            if not silent:
+                self.logger.debug(
+                    "inserted batch %d into %s, %d rows sent, %d rows affected",
+                    len(batch_counts),
+                    table_name,
+                    len(batch),
+                    cnt,
+                )
+        return batch_counts
 
     def update(
         self,
@@ -659,23 +1497,161 @@ class MysqlClient:
             self.logger.info("nothing to update")
             return tuple()
 
-        for col in update_col_value:
-            update_col_value[col] = self.obj_to_str(update_col_value[col])
-
-        query = f"UPDATE {table_name} SET "
-        update_col = update_col_col | update_col_value
-        update_ls = [f" {col} = {update_col[col]} " for col in update_col]
-        query = query + f" {', '.join(update_ls)} "
-        query = query + f""" WHERE id IN ('{"', '".join(ids_to_update_ls)}')"""
+        query = update_template(
+            table_name=table_name,
+            update_col_col=tuple(update_col_col.items()),
+            update_col_value=tuple(update_col_value),
+            shape=(("in", "id", len(ids_to_update_ls)),),
+        )
+        args = tuple(update_col_value.values()) + tuple(ids_to_update_ls)
         try:
-            self.execute(query=query, silent=silent)
+            self.execute(query=query, args=args, silent=silent, commit=True)
         except MySqlWrongQueryError as e:
             self.logger.warning(f"wrong query when updating, {traceback.format_exc()}")
             raise e
-        self.connection.commit()  # type: ignore
 
         return self.select(table_name=table_name, cond_in={"id": ids_to_update_ls})
 
+    def update_where(
+        self,
+        table_name: str,
+        update_col_col: dict[str, str] = dict(),
+        update_col_value: dict[str, object] = dict(),
+        cond_null: list[str] = list(),
+        cond_not_null: list[str] = list(),
+        cond_in: dict[str, list] = dict(),
+        cond_eq: dict[str, object] = dict(),
+        cond_neq: dict[str, object] = dict(),
+        cond_leq: dict[str, object] = dict(),
+        cond_geq: dict[str, object] = dict(),
+        cond_l: dict[str, object] = dict(),
+        cond_g: dict[str, object] = dict(),
+        silent: bool = False,
+    ) -> int:
+        """Update rows based on conditions with a single UPDATE statement.
+
+        Unlike update, the updated rows are neither selected before nor
+        returned after, which saves two round trips.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to update
+        update_col_col : dict[str, str], optional
+            Dictionary mapping columns to update with other column values
+        update_col_value : dict[str, object], optional
+            Dictionary mapping columns to update with specific values
+        cond_null : list[str], optional
+            Columns that must be NULL
+        cond_not_null : list[str], optional
+            Columns that must not be NULL
+        cond_in : dict[str, list], optional
+            Column values that must be in given list
+        cond_eq : dict[str, object], optional
+            Column values that must equal given value
+        cond_neq : dict[str, object], optional
+            Column values that must not equal given value
+        cond_leq : dict[str, object], optional
+            Column values that must be less than or equal to given value
+        cond_geq : dict[str, object], optional
+            Column values that must be greater than or equal to given value
+        cond_l : dict[str, object], optional
+            Column values that must be less than given value
+        cond_g : dict[str, object], optional
+            Column values that must be greater than given value
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+
+        Returns
+        -------
+        int
+            Number of updated rows
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        DuplicateColumnUpdateError
+            If a column appears in both update_col_col and update_col_value
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        if not update_col_col and not update_col_value:
+            raise MySqlNoUpdateValuesError()
+        for col in update_col_col:
+            if col in update_col_value:
+                raise (MySqlDuplicateColumnUpdateError(column=col))
+
+        shape, args = self.cond_shape(
+            cond_eq=cond_eq,
+            cond_g=cond_g,
+            cond_geq=cond_geq,
+            cond_in=cond_in,
+            cond_l=cond_l,
+            cond_leq=cond_leq,
+            cond_neq=cond_neq,
+            cond_not_null=cond_not_null,
+            cond_null=cond_null,
+        )
+        query = update_template(
+            table_name=table_name,
+            update_col_col=tuple(update_col_col.items()),
+            update_col_value=tuple(update_col_value),
+            shape=shape,
+        )
+        try:
+            return self.execute_rowcount(
+                query=query,
+                args=tuple(update_col_value.values()) + args,
+                silent=silent,
+                commit=True,
+            )
+        except MySqlWrongQueryError as e:
+            self.logger.warning(f"wrong query when updating, {traceback.format_exc()}")
+            raise e
+
+    def update_many(
+        self,
+        table_name: str,
+        ids: list[str],
+        values: dict[str, object],
+        silent: bool = False,
+    ) -> int:
+        """Set the same values on several rows, identified by their IDs.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to update
+        ids : list[str]
+            IDs of the rows to update
+        values : dict[str, object]
+            Dictionary of column names and their new values
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+
+        Returns
+        -------
+        int
+            Number of updated rows
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        if not ids:
+            # an empty IN condition is dropped, it would update the whole table
+            return 0
+        return self.update_where(
+            table_name=table_name,
+            update_col_value={k: v for (k, v) in values.items() if k != "id"},
+            cond_in={"id": ids},
+            silent=silent,
+        )
+
     def update_by_id(
         self, table_name: str, id: str, values: dict[str, object], silent=False
     ) -> dict:
@@ -725,3 +1701,49 @@ class MysqlClient:
         if res:
             return True
         return False
+
+    def existing_ids(
+        self,
+        table_name: str,
+        ids: list[str],
+        chunk_size: int = 1000,
+        silent: bool = False,
+    ) -> set[str]:
+        """Find which of the given IDs are present in a database table.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the table to look into
+        ids : list[str]
+            IDs to look for
+        chunk_size : int, optional
+            Maximum number of IDs per WHERE id IN (...) query, by default 1000
+        silent : bool, optional
+            If True, suppress logging of the query execution, by default False
+
+        Returns
+        -------
+        set[str]
+            Subset of ids found in the table
+
+        Raises
+        ------
+        NoConnectionError
+            If no database connection exists
+        MySqlWrongQueryError
+            If query is wrong
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size=}")
+        unique_ids = list(dict.fromkeys(ids))
+        found: set[str] = set()
+        for start in range(0, len(unique_ids), chunk_size):
+            res_mysql = self.select(
+                table_name=table_name,
+                select_col=["id"],
+                cond_in={"id": unique_ids[start : start + chunk_size]},
+                silent=silent,
+            )
+            found.update(str(row["id"]) for row in res_mysql)
+        return found
@@ -1,8 +1,21 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
 from logging import Logger
 
-from requests import Session
+import httpx
+from requests import RequestException, Response, Session
 
-from _config import GITHUB_TOKEN, base_logger
+from _config import GITHUB_GRAPHQL_URL, GITHUB_TOKEN, DateTimeFormat, base_logger
+
+RATE_LIMIT_ALIAS = "bpRateLimit"
+RATE_LIMIT_SELECTION = (
+    f"{RATE_LIMIT_ALIAS}: rateLimit {{ cost remaining resetAt limit }}"
+)
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+# the answers of GithubClient and of AsyncGithubClient, read the same way
+HttpResponse = Response | httpx.Response
 
 
 class GithubServerError(Exception):
@@ -10,33 +23,277 @@ class GithubServerError(Exception):
         super().__init__(f"problem when requesting Github Api, {detail}")
 
 
+class GithubServerTimeoutError(GithubServerError):
+    def __init__(self, detail: str | None = None) -> None:
+        super().__init__(f"Github timed out or failed to answer, {detail}")
+
+
 class GithubNoDataResponseError(Exception):
     def __init__(self, detail: str | None = None) -> None:
         super().__init__(f"got no data response {detail}")
 
 
-class GithubClient:
-    def __init__(self, logger: Logger | None = None, token: str | None = None) -> None:
+class GithubRateLimiter:
+    """Keep track of the GraphQL point budget and pace the requests on it.
+
+    One instance can be shared by several GithubClient using the same token,
+    including from different threads.
+
+    Parameters
+    ----------
+    min_remaining : int, optional
+        Below this number of remaining points, wait for the budget reset, by default 50
+    pace_ratio : float, optional
+        Below this fraction of the budget, spread the remaining points evenly
+        until the reset, by default 0.1
+    logger : Logger | None, optional
+        Logger used to report waits, by default base_logger
+    """
+
+    def __init__(
+        self,
+        min_remaining: int = 50,
+        pace_ratio: float = 0.1,
+        logger: Logger | None = None,
+    ) -> None:
+        self.logger = logger if logger else base_logger
+        self.min_remaining = min_remaining
+        self.pace_ratio = pace_ratio
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at: float | None = None
+        self.last_cost: int | None = None
+        self.next_request_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Block the caller until it may send its next request."""
+        time.sleep(self.delay())
+
+    def delay(self) -> float:
+        """Reserve the caller's next request and return how long to wait before it."""
+        with self.lock:
+            now = time.time()
+            if self.remaining is None or self.reset_at is None or self.reset_at <= now:
+                return 0.0
+            if self.remaining <= max(self.min_remaining, self.last_cost or 0):
+                # every caller waits for the reset, once it is past the first
+                # check lets them all go on the refilled budget
+                self.next_request_at = max(self.next_request_at, self.reset_at + 1)
+                sleep_until = self.next_request_at
+                message = f"Github rate limit almost exhausted, {self.remaining=}, waiting until reset"
+            elif self.limit and self.remaining < self.limit * self.pace_ratio:
+                interval = (self.reset_at - now) / self.remaining
+                sleep_until = max(now, self.next_request_at) + interval
+                self.next_request_at = sleep_until
+                message = (
+                    f"Github rate limit low, pacing requests every {interval:.2f}s"
+                )
+            else:
+                return 0.0
+        self.logger.info(message)
+        return max(0.0, sleep_until - time.time())
+
+    def update_from_headers(self, resp: HttpResponse):
+        remaining = resp.headers.get("x-ratelimit-remaining")
+        reset = resp.headers.get("x-ratelimit-reset")
+        limit = resp.headers.get("x-ratelimit-limit")
+        with self.lock:
+            if remaining is not None and remaining.isdigit():
+                self.remaining = int(remaining)
+            if reset is not None and reset.isdigit():
+                self.reset_at = float(reset)
+            if limit is not None and limit.isdigit():
+                self.limit = int(limit)
+
+    def update_from_data(self, rate_limit: dict):
+        reset_at = datetime.strptime(
+            str(rate_limit["resetAt"]), DateTimeFormat.github
+        ).replace(tzinfo=timezone.utc)
+        with self.lock:
+            self.last_cost = int(str(rate_limit["cost"]))
+            self.remaining = int(str(rate_limit["remaining"]))
+            self.limit = int(str(rate_limit["limit"]))
+            self.reset_at = reset_at.timestamp()
+
+    def seconds_until_reset(self) -> float:
+        with self.lock:
+            if self.reset_at is None:
+                return 0.0
+            return max(0.0, self.reset_at - time.time())
+
+
+class GithubRequestStats:
+    """Requests sent to Github, and what they cost, by every GithubClient
+    sharing the instance, including from different threads."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.retries = 0
+        self.bytes_received = 0
+        # GraphQL points spent, as reported by the rateLimit selection
+        self.cost = 0
+        self.lock = threading.Lock()
+
+    def record_response(self, resp: HttpResponse):
+        with self.lock:
+            self.requests += 1
+            self.bytes_received += len(resp.content)
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def record_cost(self, rate_limit: dict):
+        with self.lock:
+            self.cost += int(str(rate_limit["cost"]))
+
+
+class GithubClientBase:
+    """Configuration, retry policy and response handling shared by the
+    synchronous and asynchronous Github clients, which only differ in how
+    they send the request and sleep."""
+
+    def __init__(
+        self,
+        logger: Logger | None = None,
+        token: str | None = None,
+        rate_limiter: GithubRateLimiter | None = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        timeout: float | None = None,
+        url: str | None = None,
+        stats: GithubRequestStats | None = None,
+    ) -> None:
         self.logger = logger if logger else base_logger
-        self.session = Session()
         self.token = token if token else GITHUB_TOKEN
+        self.url = url if url else GITHUB_GRAPHQL_URL
         self.date_format = "%Y-%m-%dT%H:%M:%SZ"
+        self.rate_limiter = (
+            rate_limiter if rate_limiter else GithubRateLimiter(logger=self.logger)
+        )
+        self.stats = stats if stats else GithubRequestStats()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
 
-    def close(self):
-        self.session.close()
+    def backoff_delay(self, attempt: int, resp: HttpResponse | None = None) -> float:
+        """Compute how long to wait before retrying a failed request.
+
+        Honours the Retry-After header of secondary rate limits, waits for the
+        budget reset when the primary rate limit is exhausted and otherwise
+        uses an exponential backoff with full jitter.
+        """
+        if resp is not None:
+            retry_after = resp.headers.get("retry-after")
+            if retry_after is not None and retry_after.isdigit():
+                return float(retry_after)
+            if resp.headers.get("x-ratelimit-remaining") == "0":
+                return self.rate_limiter.seconds_until_reset() + 1
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def is_rate_limited(self, resp: HttpResponse) -> bool:
+        if resp.status_code == 429:
+            return True
+        if resp.status_code != 403:
+            return False
+        if resp.headers.get("x-ratelimit-remaining") == "0":
+            return True
+        return "rate limit" in resp.text.lower()
 
-    def graphql_post(self, query: str, silent=False) -> dict:
+    def has_rate_limited_error(self, resp: HttpResponse) -> bool:
+        if resp.status_code != 200 or b"RATE_LIMITED" not in resp.content:
+            return False
+        try:
+            errors = resp.json().get("errors") or list()
+        except Exception:
+            return False
+        return any(
+            isinstance(error, dict) and error.get("type") == "RATE_LIMITED"
+            for error in errors
+        )
+
+    def prepare_query(self, query: str, with_rate_limit: bool, silent=False) -> str:
+        if with_rate_limit:
+            query = query.replace("{", "{ " + RATE_LIMIT_SELECTION, 1)
         if not silent:
-            self.logger.debug(f"posting to github {query=}")
+            self.logger.debug("posting to github query=%r", query)
+        return query
 
-        headers = {"Authorization": f"token {self.token}"}
-        resp = self.session.post(
-            url="https://api.github.com/graphql", headers=headers, json={"query": query}
+    def network_error_delay(
+        self, error: Exception, attempt: int, retry_on_server_error: bool
+    ) -> float:
+        """Return how long to wait before retrying after a network error.
+
+        Raises
+        ------
+        GithubServerTimeoutError
+            If retry_on_server_error is False
+        GithubServerError
+            If max_retries is reached
+        """
+        message = f"could not reach Github : {type(error)=}, {str(error)=}."
+        if not retry_on_server_error:
+            self.logger.warning(message)
+            raise GithubServerTimeoutError(detail=message)
+        if attempt >= self.max_retries:
+            self.logger.warning(message)
+            raise GithubServerError(detail=message)
+        delay = self.backoff_delay(attempt=attempt)
+        self.logger.warning(
+            f"could not reach Github : {type(error)=}, retrying in {delay:.1f}s"
         )
+        return delay
+
+    def retry_delay(
+        self,
+        resp: HttpResponse,
+        attempt: int,
+        retry_on_server_error: bool,
+        silent=False,
+    ) -> float | None:
+        """Return how long to wait before retrying, None if resp is final.
 
+        Raises
+        ------
+        GithubServerTimeoutError
+            If Github answers 502/503/504 and retry_on_server_error is False
+        """
+        self.rate_limiter.update_from_headers(resp)
+        self.stats.record_response(resp)
         if not silent:
-            self.logger.debug(f"got from github {resp.content=}")
+            self.logger.debug("got from github resp.content=%r", resp.content)
+
+        if resp.status_code in RETRYABLE_STATUS_CODES and not retry_on_server_error:
+            message = f"Github failed to answer {resp.status_code=}."
+            self.logger.warning(message)
+            raise GithubServerTimeoutError(detail=message)
+        retryable = (
+            resp.status_code in RETRYABLE_STATUS_CODES
+            or self.is_rate_limited(resp)
+            or self.has_rate_limited_error(resp)
+        )
+        if not retryable or attempt >= self.max_retries:
+            return None
+        self.stats.record_retry()
+        delay = self.backoff_delay(attempt=attempt, resp=resp)
+        self.logger.warning(
+            f"Github answered {resp.status_code=}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})"
+        )
+        return delay
+
+    def read_data(self, query: str, resp: HttpResponse, with_rate_limit: bool) -> dict:
+        """Return the data field of a final response.
 
+        Raises
+        ------
+        GithubServerError
+            If Github answers with an error status
+        GithubNoDataResponseError
+            If the response has no data
+        """
         if not resp.status_code == 200:
             message = f"could not get response from Github {resp.status_code=}."
             self.logger.warning(message)
@@ -47,8 +304,122 @@ class GithubClient:
             message = f"could not serialized Github response : {type(e)=}, {str(e)=}."
             self.logger.warning(message)
             raise GithubServerError(detail=message)
-        if not isinstance(resp_dict, dict) or "data" not in resp_dict:
+        if not isinstance(resp_dict, dict) or not isinstance(
+            resp_dict.get("data"), dict
+        ):
             message = f"{query=} got response without data : {str(resp_dict)=}"
             self.logger.warning(message)
             raise GithubNoDataResponseError(detail=message)
-        return resp_dict["data"]
+        data = resp_dict["data"]
+        if with_rate_limit and data.get(RATE_LIMIT_ALIAS):
+            rate_limit = data.pop(RATE_LIMIT_ALIAS)
+            self.rate_limiter.update_from_data(rate_limit)
+            self.stats.record_cost(rate_limit)
+        return data
+
+
+class GithubClient(GithubClientBase):
+    def __init__(
+        self,
+        logger: Logger | None = None,
+        token: str | None = None,
+        rate_limiter: GithubRateLimiter | None = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        timeout: float | None = None,
+        url: str | None = None,
+        stats: GithubRequestStats | None = None,
+    ) -> None:
+        super().__init__(
+            logger=logger,
+            token=token,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            backoff_base=backoff_base,
+            backoff_max=backoff_max,
+            timeout=timeout,
+            url=url,
+            stats=stats,
+        )
+        self.session = Session()
+
+    def close(self):
+        self.session.close()
+
+    def graphql_post(
+        self,
+        query: str,
+        silent=False,
+        with_rate_limit: bool = True,
+        retry_on_server_error: bool = True,
+    ) -> dict:
+        """Post a GraphQL query to Github and return its data.
+
+        Requests are paced on the rate limit budget, and 502/503/504, rate
+        limited responses and network errors are retried with a jittered
+        exponential backoff up to max_retries times.
+
+        Parameters
+        ----------
+        query : str
+            GraphQL document to send
+        silent : bool, optional
+            If True, suppress logging of the request and response, by default False
+        with_rate_limit : bool, optional
+            If True, also ask for rateLimit { cost remaining resetAt } to track
+            the budget, by default True
+        retry_on_server_error : bool, optional
+            If False, 502/503/504 responses and network errors are not retried
+            but raised at once as GithubServerTimeoutError, so that the caller
+            can lighten its query, by default True
+
+        Returns
+        -------
+        dict
+            data field of the response
+
+        Raises
+        ------
+        GithubServerError
+            If Github answers with an error status, or a retryable one too many times
+        GithubServerTimeoutError
+            If Github times out or answers 502/503/504 and retry_on_server_error is False
+        GithubNoDataResponseError
+            If the response has no data
+        """
+        query = self.prepare_query(
+            query=query, with_rate_limit=with_rate_limit, silent=silent
+        )
+        headers = {"Authorization": f"token {self.token}"}
+        attempt = 0
+        while True:
+            self.rate_limiter.wait()
+            try:
+                resp = self.session.post(
+                    url=self.url,
+                    headers=headers,
+                    json={"query": query},
+                    timeout=self.timeout,
+                )
+            except RequestException as e:
+                time.sleep(
+                    self.network_error_delay(
+                        error=e,
+                        attempt=attempt,
+                        retry_on_server_error=retry_on_server_error,
+                    )
+                )
+                attempt += 1
+                continue
+            delay = self.retry_delay(
+                resp=resp,
+                attempt=attempt,
+                retry_on_server_error=retry_on_server_error,
+                silent=silent,
+            )
+            if delay is None:
+                break
+            time.sleep(delay)
+            attempt += 1
+        return self.read_data(query=query, resp=resp, with_rate_limit=with_rate_limit)
@@ -0,0 +1,132 @@
+import asyncio
+from logging import Logger
+
+import httpx
+
+from _github_api import GithubClientBase, GithubRateLimiter, GithubRequestStats
+
+
+class AsyncGithubClient(GithubClientBase):
+    """asyncio counterpart of GithubClient, with the same graphql_post contract.
+
+    Requests go through one httpx.AsyncClient keeping its connections alive,
+    and at most max_concurrency of them are in flight at once. The client
+    must be used, and closed, from a single event loop.
+
+    Parameters
+    ----------
+    max_concurrency : int, optional
+        Maximum number of requests in flight, also the size of the
+        connection pool, by default 10
+    http2 : bool, optional
+        If True, multiplex the requests over HTTP/2 connections, which needs
+        the h2 package (pip install httpx[http2]), by default False
+
+    The other parameters are the ones of GithubClient.
+    """
+
+    def __init__(
+        self,
+        logger: Logger | None = None,
+        token: str | None = None,
+        rate_limiter: GithubRateLimiter | None = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        timeout: float | None = None,
+        max_concurrency: int = 10,
+        http2: bool = False,
+        url: str | None = None,
+        stats: GithubRequestStats | None = None,
+    ) -> None:
+        super().__init__(
+            logger=logger,
+            token=token,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            backoff_base=backoff_base,
+            backoff_max=backoff_max,
+            timeout=timeout,
+            url=url,
+            stats=stats,
+        )
+        if max_concurrency < 1:
+            raise ValueError(
+                f"max_concurrency must be positive, got {max_concurrency=}"
+            )
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncGithubClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def graphql_post(
+        self,
+        query: str,
+        silent=False,
+        with_rate_limit: bool = True,
+        retry_on_server_error: bool = True,
+    ) -> dict:
+        """Post a GraphQL query to Github and return its data.
+
+        Same pacing, retries and errors as GithubClient.graphql_post, waits
+        only suspend the calling task.
+
+        Raises
+        ------
+        GithubServerError
+            If Github answers with an error status, or a retryable one too many times
+        GithubServerTimeoutError
+            If Github times out or answers 502/503/504 and retry_on_server_error is False
+        GithubNoDataResponseError
+            If the response has no data
+        """
+        query = self.prepare_query(
+            query=query, with_rate_limit=with_rate_limit, silent=silent
+        )
+        headers = {"Authorization": f"token {self.token}"}
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.rate_limiter.delay())
+            try:
+                async with self.semaphore:
+                    resp = await self.client.post(
+                        url=self.url,
+                        headers=headers,
+                        json={"query": query},
+                    )
+            except httpx.TransportError as e:
+                await asyncio.sleep(
+                    self.network_error_delay(
+                        error=e,
+                        attempt=attempt,
+                        retry_on_server_error=retry_on_server_error,
+                    )
+                )
+                attempt += 1
+                continue
+            delay = self.retry_delay(
+                resp=resp,
+                attempt=attempt,
+                retry_on_server_error=retry_on_server_error,
+                silent=silent,
+            )
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+        return self.read_data(query=query, resp=resp, with_rate_limit=with_rate_limit)
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging import Logger
+from typing import Iterator
+
+from _config import base_logger
+
+PROMETHEUS_PREFIX = "batch_job"
+
+
+def prometheus_name(name: str) -> str:
+    return "".join(char if char.isalnum() else "_" for char in name).lower()
+
+
+def prometheus_labels(**labels: str) -> str:
+    escaped = {
+        key: value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for key, value in labels.items()
+    }
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+
+class JobMetrics:
+    """Wall time per stage, counters and per item durations of one job run.
+
+    Stages and durations add up when entered several times, so a stage run
+    once per page reports its total. Every method can be called from
+    several threads. The metrics are reported at the end of the run as one
+    JSON log record (see JsonFormatter) and optionally as a Prometheus
+    textfile, for the node_exporter textfile collector.
+
+    Parameters
+    ----------
+    job : str
+        Name of the job, the job label of the Prometheus metrics
+    """
+
+    def __init__(self, job: str) -> None:
+        self.job = job
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.succeeded = False
+        self.stages: dict[str, float] = dict()
+        self.counters: dict[str, float] = dict()
+        self.durations: dict[str, dict[str, float]] = dict()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_counter(self, name: str, value: float):
+        # for totals tracked elsewhere, such as GithubRequestStats
+        with self.lock:
+            self.counters[name] = value
+
+    def add_duration(self, kind: str, key: str, seconds: float):
+        with self.lock:
+            durations = self.durations.setdefault(kind, dict())
+            durations[key] = durations.get(key, 0.0) + seconds
+
+    def wall_time(self) -> float:
+        return time.perf_counter() - self.start
+
+    def as_dict(self) -> dict[str, object]:
+        with self.lock:
+            return {
+                "job": self.job,
+                "succeeded": self.succeeded,
+                "wall_time_s": round(self.wall_time(), 3),
+                "stages_s": {
+                    name: round(seconds, 3) for name, seconds in self.stages.items()
+                },
+                "counters": dict(self.counters),
+                "durations_s": {
+                    kind: {key: round(seconds, 3) for key, seconds in durations.items()}
+                    for kind, durations in self.durations.items()
+                },
+            }
+
+    def log(self, logger: Logger | None = None):
+        """Log the metrics as one INFO record, kept structured by JsonFormatter."""
+        logger = logger if logger else base_logger
+        logger.info(
+            f"{self.job} metrics", extra={"json_fields": {"metrics": self.as_dict()}}
+        )
+
+    def prometheus_text(self) -> str:
+        job = {"job": self.job}
+        lines: list[str] = list()
+
+        def gauge(name: str, help: str, samples: list[tuple[dict[str, str], float]]):
+            metric = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {help}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in samples:
+                lines.append(f"{metric}{prometheus_labels(**labels)} {value}")
+
+        with self.lock:
+            gauge(
+                "last_run_timestamp_seconds",
+                "Start time of the last run.",
+                [(job, self.started_at)],
+            )
+            gauge(
+                "success", "1 if the last run succeeded.", [(job, int(self.succeeded))]
+            )
+            gauge(
+                "duration_seconds",
+                "Wall time of the last run.",
+                [(job, round(self.wall_time(), 3))],
+            )
+            gauge(
+                "stage_duration_seconds",
+                "Wall time spent in each stage of the last run.",
+                [
+                    ({**job, "stage": name}, round(seconds, 3))
+                    for name, seconds in self.stages.items()
+                ],
+            )
+            for name, value in self.counters.items():
+                gauge(prometheus_name(name), f"{name} of the last run.", [(job, value)])
+            if self.durations:
+                gauge(
+                    "items",
+                    "Number of items with a duration in the last run.",
+                    [
+                        ({**job, "kind": kind}, len(durations))
+                        for kind, durations in self.durations.items()
+                    ],
+                )
+                # per item samples would be too many series, only the sum and max
+                gauge(
+                    "item_duration_seconds",
+                    "Total and slowest duration of the items of the last run.",
+                    [
+                        (
+                            {**job, "kind": kind, "stat": stat},
+                            round(function(durations.values()), 3),
+                        )
+                        for kind, durations in self.durations.items()
+                        for stat, function in (("sum", sum), ("max", max))
+                    ],
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, logger: Logger | None = None):
+        """Write the metrics in the Prometheus text format, atomically so
+        that the collector never reads a partial file. A failed write is
+        logged and does not fail the job."""
+        logger = logger if logger else base_logger
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(
+                f"could not write metrics to {path=} : {type(e)=}, {str(e)=}"
+            )
@@ -1,5 +1,33 @@
 from datetime import datetime
 
+from _config import DateTimeFormat
+
+
+def github_to_bp_co_long(date: str) -> str | None:
+    # 2020-01-31T12:00:00Z -> 2020-01-31 12:00:00, None if not in that shape
+    if len(date) != 20 or date[10] != "T" or date[19] != "Z":
+        return None
+    return date[:10] + " " + date[11:19]
+
+
+def bp_co_long_to_github(date: str) -> str | None:
+    # 2020-01-31 12:00:00 -> 2020-01-31T12:00:00Z, None if not in that shape
+    if len(date) != 19 or date[10] != " ":
+        return None
+    return date[:10] + "T" + date[11:] + "Z"
+
+
+# conversions between fixed width formats, done by slicing instead of strptime
+FAST_CONVERTERS = {
+    (DateTimeFormat.github, DateTimeFormat.bp_co_long): github_to_bp_co_long,
+    (DateTimeFormat.bp_co_long, DateTimeFormat.github): bp_co_long_to_github,
+}
+
 
 def transform_datetime(date: str, input_format: str, output_formt: str) -> str:
+    converter = FAST_CONVERTERS.get((input_format, output_formt))
+    if converter:
+        res = converter(date)
+        if res is not None:
+            return res
     return datetime.strptime(date, input_format).strftime(output_formt)
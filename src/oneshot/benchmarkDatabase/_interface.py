@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+root_path = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_path))
+
+from _config import ENV, DateTimeFormat, ServiceEnv, get_logger
+from _database_pymysql import MysqlClient
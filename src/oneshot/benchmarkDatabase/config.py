@@ -0,0 +1,27 @@
+from _interface import ENV as SERVICE_ENV
+from _interface import get_logger
+
+# the synthetic tables are named after the real ones with this prefix, they are
+# dropped and created again, so the benchmark refuses to run when SERVICE_ENV,
+# the ENV of .env, is production
+TABLE_PREFIX = "bench_"
+# size of the generated dataset
+REPOSITORIES = 1000
+USERS = 10000
+COMMITS = 1_000_000
+# seed of the generator, a same seed always gives the same rows
+SEED = 42
+# rows per INSERT when generating
+GENERATION_BATCH_SIZE = 5000
+# timed runs of each workload, after WARMUP_RUNS untimed ones
+RUNS = 200
+WARMUP_RUNS = 10
+# number of ids of the IN-list workloads, as the fetcher's existence checks and
+# user lookups send them
+IN_LIST_SIZE = 1000
+# rows per batch of the insert workload, INSERT_BATCH_SIZE of fetchCommits
+INSERT_BATCH_SIZE = 500
+# page size of the pagination workload
+PAGE_SIZE = 1000
+
+logger = get_logger(name="BenchmarkDatabaseLogger", env=SERVICE_ENV)
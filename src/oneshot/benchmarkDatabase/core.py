@@ -0,0 +1,564 @@
+import hashlib
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from logging import Logger
+from typing import Callable, Iterator
+
+from _interface import DateTimeFormat, MysqlClient, ServiceEnv
+from config import (
+    GENERATION_BATCH_SIZE,
+    IN_LIST_SIZE,
+    INSERT_BATCH_SIZE,
+    PAGE_SIZE,
+    RUNS,
+    SERVICE_ENV,
+    TABLE_PREFIX,
+    WARMUP_RUNS,
+)
+
+# columns of the tables as read and written by fetchCommits
+TABLE_COLUMNS = {
+    "git_user": {
+        "id": "VARCHAR(64) NOT NULL PRIMARY KEY",
+        "login": "VARCHAR(255)",
+        "avatarUrl": "VARCHAR(255)",
+        "email": "VARCHAR(255)",
+        "name": "VARCHAR(255)",
+    },
+    "repository": {
+        "id": "VARCHAR(64) NOT NULL PRIMARY KEY",
+        "name": "VARCHAR(255) NOT NULL",
+        "ownerIdUser": "VARCHAR(64)",
+        "ownerIdOrganization": "VARCHAR(64)",
+        "ownerIsOrganization": "TINYINT(1) NOT NULL",
+        "rootCommitIsReached": "TINYINT(1) NOT NULL",
+        "trackedBranchRef": "VARCHAR(255)",
+        "lastSeenHeadOid": "CHAR(40)",
+    },
+    "commit": {
+        "id": "VARCHAR(64) NOT NULL PRIMARY KEY",
+        "repositoryId": "VARCHAR(64) NOT NULL",
+        "additions": "INT",
+        "deletions": "INT",
+        "authoredDate": "DATETIME",
+        "authorAvatarUrl": "VARCHAR(255)",
+        "authorEmail": "VARCHAR(255)",
+        "authorId": "VARCHAR(64)",
+        "authorName": "VARCHAR(255)",
+        "committedDate": "DATETIME NOT NULL",
+        "committerAvatarUrl": "VARCHAR(255)",
+        "committerEmail": "VARCHAR(255)",
+        "committerId": "VARCHAR(64)",
+        "committerName": "VARCHAR(255)",
+    },
+}
+# the index read by the commit bounds query of fetchCommits
+COMMIT_BOUNDS_INDEX = ["repositoryId", "committedDate"]
+FIRST_COMMIT_DATE = datetime(2015, 1, 1)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    # nearest rank, sorted_values being non empty
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class SyntheticDataset:
+    """Deterministic git_user, repository and commit rows.
+
+    Commits are spread over the repositories following a Zipf law, a few
+    repositories holding most of the history as in the tracked ones, and
+    every id and value is derived from the seed and the row position, so
+    that any row can be rebuilt without keeping the dataset in memory.
+    """
+
+    def __init__(
+        self,
+        repositories: int,
+        users: int,
+        commits: int,
+        seed: int,
+        table_prefix: str = TABLE_PREFIX,
+    ) -> None:
+        if min(repositories, users) < 1 or commits < repositories:
+            raise ValueError(
+                f"need at least one user and one commit per repository, got {repositories=}, {users=}, {commits=}"
+            )
+        self.repositories = repositories
+        self.users = users
+        self.commits = commits
+        self.seed = seed
+        self.table_prefix = table_prefix
+        harmonic = sum(1 / (rank + 1) for rank in range(repositories))
+        self.sizes = [
+            max(1, int(commits / (rank + 1) / harmonic)) for rank in range(repositories)
+        ]
+        # rounding leftovers go to the biggest repository
+        self.sizes[0] += commits - sum(self.sizes)
+
+    def table(self, name: str) -> str:
+        return f"{self.table_prefix}{name}"
+
+    def digest(self, *parts: object) -> str:
+        return hashlib.sha1(
+            "-".join(str(part) for part in (self.seed, *parts)).encode()
+        ).hexdigest()
+
+    def user_id(self, index: int) -> str:
+        return f"U_{self.digest('user', index)[:20]}"
+
+    def repository_id(self, index: int) -> str:
+        return f"R_{self.digest('repository', index)[:20]}"
+
+    def commit_id(self, repo_index: int, index: int) -> str:
+        return f"C_{self.digest('commit', repo_index, index)[:30]}"
+
+    def user_row(self, index: int) -> tuple:
+        return (
+            self.user_id(index),
+            f"login{index}",
+            f"https://avatars.example.com/u/{index}",
+            f"user{index}@example.com",
+            f"User {index}",
+        )
+
+    def repository_row(self, index: int) -> tuple:
+        return (
+            self.repository_id(index),
+            f"repository{index}",
+            self.user_id(index % self.users),
+            None,
+            0,
+            0,
+            "main",
+            None,
+        )
+
+    def commit_row(self, repo_index: int, index: int) -> tuple:
+        digest = self.digest("commit", repo_index, index)
+        # repositories start a day apart, commits of one are an hour apart
+        date = FIRST_COMMIT_DATE + timedelta(days=repo_index, hours=index)
+        user = int(digest[30:36], 16) % self.users
+        identity = (
+            f"https://avatars.example.com/u/{user}",
+            f"user{user}@example.com",
+            # a fifth of the commits come from git identities without Github user
+            self.user_id(user) if int(digest[36:38], 16) % 5 else None,
+            f"User {user}",
+        )
+        return (
+            f"C_{digest[:30]}",
+            self.repository_id(repo_index),
+            int(digest[:4], 16) % 500,
+            int(digest[4:8], 16) % 200,
+            date.strftime(DateTimeFormat.bp_co_long),
+            *identity,
+            date.strftime(DateTimeFormat.bp_co_long),
+            *identity,
+        )
+
+    def rows(self, table_name: str) -> Iterator[tuple]:
+        if table_name == "git_user":
+            yield from (self.user_row(index) for index in range(self.users))
+        elif table_name == "repository":
+            yield from (
+                self.repository_row(index) for index in range(self.repositories)
+            )
+        else:
+            for repo_index, size in enumerate(self.sizes):
+                yield from (self.commit_row(repo_index, index) for index in range(size))
+
+    def row_count(self, table_name: str) -> int:
+        return {
+            "git_user": self.users,
+            "repository": self.repositories,
+            "commit": self.commits,
+        }[table_name]
+
+    def random_commit_id(self, rng: random.Random) -> str:
+        repo_index = rng.randrange(self.repositories)
+        return self.commit_id(repo_index, rng.randrange(self.sizes[repo_index]))
+
+
+class WorkloadStats:
+    """Latencies, round trips and rows of the timed runs of one workload."""
+
+    def __init__(self) -> None:
+        self.latencies: list[float] = list()
+        self.round_trips: list[int] = list()
+        self.rows: list[int] = list()
+
+    def add(self, latency: float, round_trips: int, rows: int):
+        self.latencies.append(latency)
+        self.round_trips.append(round_trips)
+        self.rows.append(rows)
+
+    def report(self) -> dict[str, object]:
+        latencies = sorted(latency * 1000 for latency in self.latencies)
+        runs = len(latencies)
+        return {
+            "runs": runs,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 3),
+                "p90": round(percentile(latencies, 90), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "max": round(latencies[-1], 3),
+                "mean": round(sum(latencies) / runs, 3),
+            },
+            "round_trips_per_run": round(sum(self.round_trips) / runs, 2),
+            "rows_per_run": round(sum(self.rows) / runs, 2),
+        }
+
+
+class DatabaseBenchmark:
+    """Scripted MysqlClient workloads against a synthetic dataset.
+
+    Each workload issues the queries of one fetchCommits step with random
+    parameters and returns the number of rows it handled. Round trips are
+    the statements the server received during a run, read from the session
+    Questions counter, which is why the client must not be pooled.
+
+    Parameters
+    ----------
+    mysql_client : MysqlClient
+        Client without pool, all the statements going through one connection
+    dataset : SyntheticDataset
+        Rows generated in the database and from which parameters are drawn
+    bounds_index : bool, optional
+        If True, the (repositoryId, committedDate) index of commit is created
+        with the tables, by default True
+    """
+
+    def __init__(
+        self,
+        mysql_client: MysqlClient,
+        logger: Logger,
+        dataset: SyntheticDataset,
+        runs: int = RUNS,
+        warmup_runs: int = WARMUP_RUNS,
+        in_list_size: int = IN_LIST_SIZE,
+        insert_batch_size: int = INSERT_BATCH_SIZE,
+        page_size: int = PAGE_SIZE,
+        bounds_index: bool = True,
+    ) -> None:
+        if mysql_client.pool:
+            raise ValueError(
+                "round trips are counted on one connection, the client must not be pooled"
+            )
+        if runs < 1:
+            raise ValueError(f"runs must be positive, got {runs=}")
+        self.mysql_client = mysql_client
+        self.logger = logger
+        self.dataset = dataset
+        self.runs = runs
+        self.warmup_runs = warmup_runs
+        self.in_list_size = in_list_size
+        self.insert_batch_size = insert_batch_size
+        self.page_size = page_size
+        self.bounds_index = bounds_index
+        self.rng = random.Random(dataset.seed)
+        # batches inserted by insert_batch, deleted in order by delete_batch
+        self.inserted_batches: deque[list[str]] = deque()
+        self.inserted = 0
+        # statements counted by reading the Questions counter itself
+        self.counter_overhead = 0
+
+    def generate(self, database: str, regenerate: bool = False):
+        """Create and fill the tables, unless they already hold the dataset.
+
+        The tables are dropped first, so database must name the database of
+        the client, as a confirmation of where they are, and production is
+        refused.
+        """
+        if SERVICE_ENV == ServiceEnv.production:
+            raise ValueError("refusing to drop and create tables in production")
+        if database != self.mysql_client.database:
+            raise ValueError(
+                f"{database=} is not the database of the client, {self.mysql_client.database=}"
+            )
+        if not regenerate and self.is_generated():
+            self.logger.info("Synthetic tables already generated, reusing them")
+            return
+        for name, columns in TABLE_COLUMNS.items():
+            table_name = self.dataset.table(name)
+            self.logger.info(
+                f"Generating {self.dataset.row_count(name)} rows of {table_name}"
+            )
+            self.mysql_client.execute(f"DROP TABLE IF EXISTS {table_name}", commit=True)
+            self.mysql_client.execute(
+                f"CREATE TABLE {table_name} ({', '.join(f'{col} {definition}' for col, definition in columns.items())})",
+                commit=True,
+            )
+            batch: list[tuple] = list()
+            for row in self.dataset.rows(name):
+                batch.append(row)
+                if len(batch) == GENERATION_BATCH_SIZE:
+                    self.insert_generated(
+                        table_name=table_name, columns=list(columns), rows=batch
+                    )
+                    batch = list()
+            if batch:
+                self.insert_generated(
+                    table_name=table_name, columns=list(columns), rows=batch
+                )
+        if self.bounds_index:
+            # built once the rows are in, which is faster than maintaining it
+            self.logger.info("Creating the commit bounds index")
+            self.mysql_client.execute(
+                f"CREATE INDEX commit_repository_id_committed_date ON {self.dataset.table('commit')} ({', '.join(COMMIT_BOUNDS_INDEX)})",
+                commit=True,
+            )
+
+    def insert_generated(self, table_name: str, columns: list[str], rows: list[tuple]):
+        self.mysql_client.insert_many(
+            table_name=table_name,
+            rows=rows,
+            batch_size=GENERATION_BATCH_SIZE,
+            columns=columns,
+            silent=True,
+        )
+
+    def is_generated(self) -> bool:
+        for name in TABLE_COLUMNS:
+            table_name = self.dataset.table(name)
+            exists = self.mysql_client.execute(
+                "SELECT 1 FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                args=(table_name,),
+                silent=True,
+            )
+            if not exists:
+                return False
+            if self.mysql_client.count(
+                table_name=table_name, silent=True
+            ) != self.dataset.row_count(name):
+                return False
+        return (
+            self.mysql_client.has_index(
+                table_name=self.dataset.table("commit"),
+                columns=COMMIT_BOUNDS_INDEX,
+                silent=True,
+            )
+            == self.bounds_index
+        )
+
+    def questions(self) -> int:
+        res = self.mysql_client.execute(
+            "SHOW SESSION STATUS LIKE 'Questions'", silent=True
+        )
+        return int(str(res[0]["Value"]))
+
+    def workloads(self) -> dict[str, Callable[[], int]]:
+        return {
+            "point_lookup": self.point_lookup,
+            "existing_ids": self.existing_ids,
+            "user_lookup": self.user_lookup,
+            "newest_commit": self.newest_commit,
+            "commit_bounds": self.commit_bounds,
+            "count_repository_commits": self.count_repository_commits,
+            "update_by_id": self.update_by_id,
+            "update_many": self.update_many,
+            "insert_batch": self.insert_batch,
+            # after insert_batch, whose batches it deletes
+            "delete_batch": self.delete_batch,
+            "paginate_repository": self.paginate_repository,
+        }
+
+    def point_lookup(self) -> int:
+        row = self.mysql_client.select_by_id(
+            table_name=self.dataset.table("commit"),
+            id=self.dataset.random_commit_id(self.rng),
+            silent=True,
+        )
+        return 1 if row else 0
+
+    def existing_ids(self) -> int:
+        # half of the ids are known, as for a page of commits partly in database
+        ids = [
+            self.dataset.random_commit_id(self.rng)
+            for _ in range(self.in_list_size // 2)
+        ]
+        ids.extend(
+            f"C_missing{self.rng.getrandbits(96):024x}"
+            for _ in range(self.in_list_size - len(ids))
+        )
+        return len(
+            self.mysql_client.existing_ids(
+                table_name=self.dataset.table("commit"),
+                ids=ids,
+                chunk_size=self.in_list_size,
+                silent=True,
+            )
+        )
+
+    def user_lookup(self) -> int:
+        ids = [
+            self.dataset.user_id(self.rng.randrange(self.dataset.users))
+            for _ in range(self.in_list_size)
+        ]
+        return len(
+            self.mysql_client.select(
+                table_name=self.dataset.table("git_user"),
+                select_col=["id", "avatarUrl", "email", "name", "login"],
+                cond_in={"id": ids},
+                silent=True,
+            )
+        )
+
+    def newest_commit(self) -> int:
+        return len(
+            self.mysql_client.select(
+                table_name=self.dataset.table("commit"),
+                select_col=["id", "committedDate"],
+                cond_eq={"repositoryId": self.random_repository_id()},
+                order_by="committedDate",
+                ascending_order=False,
+                limit=1,
+                silent=True,
+            )
+        )
+
+    def commit_bounds(self) -> int:
+        repository_ids = self.random_repository_ids()
+        return len(
+            self.mysql_client.aggregate(
+                table_name=self.dataset.table("commit"),
+                aggregates={
+                    "newest": "MAX(committedDate)",
+                    "oldest": "MIN(committedDate)",
+                },
+                group_by=["repositoryId"],
+                cond_in={"repositoryId": repository_ids},
+                silent=True,
+            )
+        )
+
+    def count_repository_commits(self) -> int:
+        res = self.mysql_client.count(
+            table_name=self.dataset.table("commit"),
+            cond_eq={"repositoryId": self.random_repository_id()},
+            silent=True,
+        )
+        return res if res else 0
+
+    def update_by_id(self) -> int:
+        self.mysql_client.update(
+            table_name=self.dataset.table("repository"),
+            update_col_value={"rootCommitIsReached": self.rng.randrange(2)},
+            cond_eq={"id": self.random_repository_id()},
+            silent=True,
+        )
+        return 1
+
+    def update_many(self) -> int:
+        return self.mysql_client.update_many(
+            table_name=self.dataset.table("repository"),
+            ids=self.random_repository_ids(),
+            values={"rootCommitIsReached": self.rng.randrange(2)},
+            silent=True,
+        )
+
+    def insert_batch(self) -> int:
+        # new commits on top of the biggest repository
+        start = self.dataset.sizes[0] + self.inserted
+        rows = [
+            self.dataset.commit_row(0, index)
+            for index in range(start, start + self.insert_batch_size)
+        ]
+        self.inserted += len(rows)
+        self.mysql_client.insert_many(
+            table_name=self.dataset.table("commit"),
+            rows=rows,
+            batch_size=self.insert_batch_size,
+            columns=list(TABLE_COLUMNS["commit"]),
+            silent=True,
+        )
+        self.inserted_batches.append([str(row[0]) for row in rows])
+        return len(rows)
+
+    def delete_batch(self) -> int:
+        if not self.inserted_batches:
+            return 0
+        ids = self.inserted_batches.popleft()
+        self.mysql_client.delete(
+            table_name=self.dataset.table("commit"),
+            cond_in={"id": ids},
+            silent=True,
+        )
+        return len(ids)
+
+    def delete_inserted_batches(self):
+        if self.inserted_batches:
+            self.logger.info(
+                f"Deleting the {len(self.inserted_batches)} batches left by insert_batch"
+            )
+        while self.inserted_batches:
+            self.delete_batch()
+
+    def paginate_repository(self) -> int:
+        # keyset pages over one repository history, as fetchCommits walks it
+        pages = self.mysql_client.paginate(
+            table_name=self.dataset.table("commit"),
+            key=["committedDate", "id"],
+            page_size=self.page_size,
+            select_col=["id", "committedDate"],
+            cond_eq={"repositoryId": self.random_repository_id()},
+            silent=True,
+        )
+        return sum(len(page) for page in pages)
+
+    def random_repository_id(self) -> str:
+        return self.dataset.repository_id(self.rng.randrange(self.dataset.repositories))
+
+    def random_repository_ids(self) -> list[str]:
+        # a hundred distinct repositories, or all of them when fewer
+        sample = self.rng.sample(
+            range(self.dataset.repositories), min(100, self.dataset.repositories)
+        )
+        return [self.dataset.repository_id(index) for index in sample]
+
+    def measure(self, workload: Callable[[], int]) -> WorkloadStats:
+        for _ in range(self.warmup_runs):
+            workload()
+        stats = WorkloadStats()
+        for _ in range(self.runs):
+            questions = self.questions()
+            start = time.perf_counter()
+            rows = workload()
+            latency = time.perf_counter() - start
+            round_trips = self.questions() - questions - self.counter_overhead
+            stats.add(latency=latency, round_trips=round_trips, rows=rows)
+        return stats
+
+    def run(self, names: list[str] = list()) -> dict[str, object]:
+        """Run the workloads, all by default, and return their report."""
+        workloads = self.workloads()
+        unknown = set(names).difference(workloads)
+        if unknown:
+            raise ValueError(
+                f"unknown workloads {sorted(unknown)}, known ones are {list(workloads)}"
+            )
+        questions = self.questions()
+        self.counter_overhead = self.questions() - questions
+        report: dict[str, object] = dict()
+        try:
+            for name, workload in workloads.items():
+                if names and name not in names:
+                    continue
+                self.logger.info(f"Running workload {name}")
+                report[name] = self.measure(workload).report()
+        finally:
+            # insert_batch without delete_batch would leave its rows, and the
+            # next run would find the dataset changed and generate it again
+            self.delete_inserted_batches()
+        return {
+            "dataset": {
+                "repositories": self.dataset.repositories,
+                "users": self.dataset.users,
+                "commits": self.dataset.commits,
+                "seed": self.dataset.seed,
+                "bounds_index": self.bounds_index,
+            },
+            "workloads": report,
+        }
@@ -0,0 +1,85 @@
+import argparse
+import json
+
+from _interface import MysqlClient
+from config import (
+    COMMITS,
+    IN_LIST_SIZE,
+    INSERT_BATCH_SIZE,
+    PAGE_SIZE,
+    REPOSITORIES,
+    RUNS,
+    SEED,
+    USERS,
+    WARMUP_RUNS,
+    logger,
+)
+from core import DatabaseBenchmark, SyntheticDataset
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Latency and round trips of MysqlClient queries on synthetic tables"
+    )
+    parser.add_argument("--repositories", type=int, default=REPOSITORIES)
+    parser.add_argument("--users", type=int, default=USERS)
+    parser.add_argument("--commits", type=int, default=COMMITS)
+    parser.add_argument(
+        "--database",
+        required=True,
+        help="MYSQL_DATABASE of .env, where the synthetic tables are dropped and created",
+    )
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--warmup-runs", type=int, default=WARMUP_RUNS)
+    parser.add_argument("--in-list-size", type=int, default=IN_LIST_SIZE)
+    parser.add_argument("--insert-batch-size", type=int, default=INSERT_BATCH_SIZE)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument(
+        "--without-bounds-index",
+        action="store_true",
+        help="do not create the (repositoryId, committedDate) index of commit",
+    )
+    parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="drop and fill the tables again even if they hold the dataset",
+    )
+    parser.add_argument(
+        "--workload", action="append", default=list(), help="by default all of them"
+    )
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(
+        repositories=args.repositories,
+        users=args.users,
+        commits=args.commits,
+        seed=args.seed,
+    )
+    # one connection, on which the round trips are counted
+    mysql_client = MysqlClient(logger=logger, pool_size=0)
+    try:
+        benchmark = DatabaseBenchmark(
+            mysql_client=mysql_client,
+            logger=logger,
+            dataset=dataset,
+            runs=args.runs,
+            warmup_runs=args.warmup_runs,
+            in_list_size=args.in_list_size,
+            insert_batch_size=args.insert_batch_size,
+            page_size=args.page_size,
+            bounds_index=not args.without_bounds_index,
+        )
+        benchmark.generate(database=args.database, regenerate=args.regenerate)
+        report = benchmark.run(names=args.workload)
+    finally:
+        mysql_client.close()
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,11 @@ from pathlib import Path
 root_path = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(root_path))
 
-from _config import DateTimeFormat, get_logger
+from _config import GITHUB_TOKEN, DateTimeFormat, get_logger
 from _database_pymysql import MysqlClient
-from _github_api import GithubClient
+from _github_api import GithubClient, GithubServerTimeoutError
+from _github_api_async import AsyncGithubClient
+from _metrics import JobMetrics
 from _util import transform_datetime
 
 # TODO: change to the one in _config if turned to batch
@@ -0,0 +1,383 @@
+"""Offline throughput benchmark of CommitsFetcher.
+
+The fetcher runs against FakeGithubServer, a local stand-in of the Github
+GraphQL API, and an in-memory stand-in of the database, so only the fetching
+side is measured. Each scenario runs in a fresh process and prints one JSON
+report with commits/sec, requests per 1k commits and peak RSS:
+
+- full: every history is fetched from the root into an empty database
+- incremental: the database holds the commits of the full scenario and
+  --active-ratio of the repositories got --new-commits since
+
+    python benchmark.py --repos 20 --commits 2000 --latency 0.05 --workers 4
+
+With --cassette, recorded Github answers of the --repo repositories are
+replayed instead of synthetic ones (full scenario only), --record recording
+them first from api.github.com with GITHUB_TOKEN.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from logging import WARNING
+
+from _interface import (
+    AsyncGithubClient,
+    DateTimeFormat,
+    GithubClient,
+    get_logger,
+    transform_datetime,
+)
+from core import CommitsFetcher
+from fake_github import FakeGithubServer, SyntheticRepository
+
+BENCH_OWNER = "bench"
+BENCH_TOKEN = "offline"
+
+
+class MemoryMysqlClient:
+    """In-memory stand-in of MysqlClient, limited to what CommitsFetcher uses."""
+
+    def __init__(self) -> None:
+        self.pool = None
+        self.lock = threading.Lock()
+        self.tables: dict[str, dict[str, dict[str, object]]] = dict()
+
+    def close(self):
+        return
+
+    def table(self, table_name: str) -> dict[str, dict[str, object]]:
+        return self.tables.setdefault(table_name, dict())
+
+    def select(
+        self,
+        table_name: str,
+        select_col: list[str] = list(),
+        cond_in: dict[str, list] = dict(),
+        cond_eq: dict[str, object] = dict(),
+        silent: bool = False,
+        **kwargs,
+    ) -> tuple[dict[str, object], ...]:
+        with self.lock:
+            rows = [
+                row
+                for row in self.table(table_name).values()
+                if all(not ls or row.get(col) in ls for col, ls in cond_in.items())
+                and all(not val or row.get(col) == val for col, val in cond_eq.items())
+            ]
+        if select_col:
+            return tuple({col: row.get(col) for col in select_col} for row in rows)
+        return tuple(dict(row) for row in rows)
+
+    def aggregate(
+        self,
+        table_name: str,
+        aggregates: dict[str, str],
+        group_by: list[str] = list(),
+        cond_in: dict[str, list] = dict(),
+        silent: bool = False,
+        **kwargs,
+    ) -> tuple[dict[str, object], ...]:
+        groups: dict[tuple, list[dict[str, object]]] = dict()
+        for row in self.select(table_name=table_name, cond_in=cond_in):
+            groups.setdefault(tuple(row[col] for col in group_by), list()).append(row)
+        res = list()
+        for key, rows in groups.items():
+            group = dict(zip(group_by, key))
+            for alias, expr in aggregates.items():
+                function, col = expr.rstrip(")").split("(")
+                group[alias] = {"MIN": min, "MAX": max}[function.upper()](
+                    row[col] for row in rows
+                )
+            res.append(group)
+        return tuple(res)
+
+    def has_index(self, table_name: str, columns: list[str], silent=False) -> bool:
+        return True
+
+    def existing_ids(
+        self, table_name: str, ids: list[str], chunk_size: int = 1000, silent=False
+    ) -> set[str]:
+        with self.lock:
+            table = self.table(table_name)
+            return {id for id in ids if id in table}
+
+    def insert_many(
+        self,
+        table_name: str,
+        rows: list[dict[str, object]] | list[tuple],
+        batch_size: int = 1000,
+        silent=False,
+        or_ignore=False,
+        on_duplicate: list[str] = list(),
+        columns: list[str] = list(),
+    ) -> list[int]:
+        columns = columns if columns else list(rows[0])
+        with self.lock:
+            table = self.table(table_name)
+            for row in rows:
+                values = dict(zip(columns, row)) if isinstance(row, tuple) else row
+                table[str(values["id"])] = dict(values)
+        return [len(rows)]
+
+    def update_where(
+        self,
+        table_name: str,
+        update_col_value: dict[str, object] = dict(),
+        cond_in: dict[str, list] = dict(),
+        cond_eq: dict[str, object] = dict(),
+        silent: bool = False,
+        **kwargs,
+    ) -> int:
+        ids = {
+            str(row["id"])
+            for row in self.select(
+                table_name=table_name, cond_in=cond_in, cond_eq=cond_eq
+            )
+        }
+        with self.lock:
+            for id in ids:
+                self.table(table_name)[id].update(update_col_value)
+        return len(ids)
+
+    def update_many(
+        self,
+        table_name: str,
+        ids: list[str],
+        values: dict[str, object],
+        silent: bool = False,
+    ) -> int:
+        if not ids:
+            return 0
+        return self.update_where(
+            table_name=table_name, update_col_value=values, cond_in={"id": ids}
+        )
+
+
+def seed_database(
+    repositories: list[tuple[str, str, str]],
+    history: dict[str, SyntheticRepository] = dict(),
+) -> MemoryMysqlClient:
+    """Database with the (owner, name, ref) repositories, and the commits of
+    history, keyed by repository name, as if fetched by a previous run."""
+    mysql_client = MemoryMysqlClient()
+    owners = sorted({owner for owner, _, _ in repositories})
+    mysql_client.insert_many(
+        table_name="git_user",
+        rows=[{"id": f"owner-{owner}", "login": owner} for owner in owners],
+    )
+    mysql_client.insert_many(
+        table_name="repository",
+        rows=[
+            {
+                "id": f"R-{owner}-{name}",
+                "name": name,
+                "ownerIdUser": f"owner-{owner}",
+                "ownerIdOrganization": None,
+                "ownerIsOrganization": 0,
+                "rootCommitIsReached": 1 if name in history else 0,
+                "trackedBranchRef": ref,
+                "lastSeenHeadOid": (
+                    history[name].head_oid if name in history else None
+                ),
+            }
+            for owner, name, ref in repositories
+        ],
+    )
+    for owner, name, _ in repositories:
+        if name not in history:
+            continue
+        repo = history[name]
+        rows = list()
+        for index in range(repo.size):
+            node = repo.commit_node(index)
+            rows.append(
+                {
+                    "id": node["id"],
+                    "repositoryId": f"R-{owner}-{name}",
+                    "committedDate": transform_datetime(
+                        date=node["committedDate"],
+                        input_format=DateTimeFormat.github,
+                        output_formt=DateTimeFormat.bp_co_long,
+                    ),
+                }
+            )
+        mysql_client.insert_many(table_name="commit", rows=rows)
+    return mysql_client
+
+
+def run_fetcher(
+    mysql_client: MemoryMysqlClient, url: str, options: dict[str, object]
+) -> int:
+    logger = get_logger(name="BenchmarkLogger", env="production", queue_size=0)
+    logger.setLevel(WARNING)
+    # the stand-in ignores the token, which only has to be a valid header value
+    github_client = GithubClient(logger=logger, token=BENCH_TOKEN, url=url)
+    fetcher = CommitsFetcher(
+        logger=logger,
+        mysql_client=mysql_client,  # type: ignore[arg-type]
+        github_client=github_client,
+        mysql_client_factory=lambda: mysql_client,  # type: ignore[arg-type,return-value]
+        workers=int(str(options["workers"])),
+        multiplex=int(str(options["multiplex"])),
+        streaming=bool(options["streaming"]),
+        early_stop_pages=int(str(options["early_stop_pages"])),
+        head_oid_prepass=bool(options["head_oid_prepass"]),
+        silent=True,
+    )
+    try:
+        if not options["async_concurrency"]:
+            return fetcher.work()
+
+        async def work_async() -> int:
+            async with AsyncGithubClient(
+                logger=logger,
+                token=BENCH_TOKEN,
+                url=url,
+                stats=github_client.stats,
+                max_concurrency=int(str(options["async_concurrency"])),
+            ) as async_github_client:
+                return await fetcher.work_async(github_client=async_github_client)
+
+        return asyncio.run(work_async())
+    finally:
+        github_client.close()
+
+
+def run_scenario(scenario: str, options: dict[str, object]) -> dict[str, object]:
+    """Run one scenario, meant to be called in a fresh process for its peak RSS."""
+    if options["cassette"]:
+        repositories = [
+            (repo.split("/")[0], *repo.split("/")[1].split("@"))
+            for repo in list(options["repo"])  # type: ignore[call-overload]
+        ]
+        mysql_client = seed_database(repositories=repositories)  # type: ignore[arg-type]
+        server = FakeGithubServer(
+            latency=float(str(options["latency"])),
+            cassette=str(options["cassette"]),
+            record=bool(options["record"]),
+        )
+    else:
+        n_repos = int(str(options["repos"]))
+        size = int(str(options["commits"]))
+        names = [f"repo{i}" for i in range(n_repos)]
+        n_active = round(n_repos * float(str(options["active_ratio"])))
+        served = [
+            SyntheticRepository(
+                owner=BENCH_OWNER,
+                name=name,
+                size=(
+                    size + int(str(options["new_commits"]))
+                    if scenario == "incremental" and i < n_active
+                    else size
+                ),
+            )
+            for i, name in enumerate(names)
+        ]
+        history = (
+            {
+                name: SyntheticRepository(owner=BENCH_OWNER, name=name, size=size)
+                for name in names
+            }
+            if scenario == "incremental"
+            else dict()
+        )
+        mysql_client = seed_database(
+            repositories=[(BENCH_OWNER, name, "main") for name in names],
+            history=history,
+        )
+        server = FakeGithubServer(
+            repositories=served, latency=float(str(options["latency"]))
+        )
+
+    with server:
+        start = time.perf_counter()
+        inserted = run_fetcher(
+            mysql_client=mysql_client, url=server.url, options=options
+        )
+        wall_time = time.perf_counter() - start
+    return {
+        "scenario": scenario,
+        "repositories": len(mysql_client.table("repository")),
+        "commits_inserted": inserted,
+        "wall_time_s": round(wall_time, 3),
+        "commits_per_s": round(inserted / wall_time, 1) if wall_time else None,
+        "requests": server.requests,
+        "requests_per_1k_commits": (
+            round(server.requests * 1000 / inserted, 2) if inserted else None
+        ),
+        "bytes_received": server.bytes_sent,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repos", type=int, default=10)
+    parser.add_argument("--commits", type=int, default=1000, help="per repository")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per request"
+    )
+    parser.add_argument("--new-commits", type=int, default=5)
+    parser.add_argument("--active-ratio", type=float, default=0.2)
+    parser.add_argument("--scenario", choices=["full", "incremental"], action="append")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--multiplex", type=int, default=1)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument(
+        "--async-concurrency", type=int, default=0, help="above 0, fetch on asyncio"
+    )
+    parser.add_argument("--early-stop-pages", type=int, default=0)
+    parser.add_argument("--head-oid-prepass", action="store_true")
+    parser.add_argument("--cassette", help="JSON lines file of recorded answers")
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument(
+        "--repo", action="append", default=list(), help="owner/name@ref"
+    )
+    parser.add_argument("--output", help="also write the reports to this JSON file")
+    args = parser.parse_args()
+    if args.cassette and not args.repo:
+        parser.error(
+            "--cassette needs the recorded repositories as --repo owner/name@ref"
+        )
+
+    scenarios = args.scenario if args.scenario else ["full", "incremental"]
+    if args.cassette:
+        scenarios = ["full"]
+    options = vars(args)
+    reports = list()
+    for scenario in scenarios:
+        # a fresh process per scenario, so that peak RSS is its own
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            report = executor.submit(run_scenario, scenario, options).result()
+        report["options"] = {
+            key: options[key]
+            for key in (
+                "workers",
+                "multiplex",
+                "streaming",
+                "async_concurrency",
+                "early_stop_pages",
+                "head_oid_prepass",
+                "latency",
+            )
+        }
+        print(json.dumps(report))
+        reports.append(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
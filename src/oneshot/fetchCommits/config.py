@@ -1,7 +1,49 @@
+import os
+
 from _interface import get_logger
 
 # TODO: change to the one in _config if turned to batch
 ENV = "local"
-SILENT = False
+# do not log queries and responses, FETCH_COMMITS_SILENT=1 to set it at runtime,
+# also a CommitsFetcher parameter
+SILENT = os.getenv("FETCH_COMMITS_SILENT", "0").lower() in ("1", "true")
+INSERT_BATCH_SIZE = 500
+EXISTENCE_CHECK_CHUNK_SIZE = 1000
+# number of users resolved per nodes(ids: [...]) query, at most 100 on Github side
+USER_LOOKUP_CHUNK_SIZE = 100
+# number of repositories fetched concurrently, 1 keeps the sequential behaviour
+FETCH_WORKERS = 1
+# number of commits per history query, at most 100 on Github side
+PAGE_SIZE = 100
+# halve the page size on timeouts and 502, down to MIN_PAGE_SIZE
+ADAPTIVE_PAGE_SIZE = True
+MIN_PAGE_SIZE = 5
+GITHUB_REQUEST_TIMEOUT = 30
+# number of repository histories packed in one aliased query, 1 disables it
+MULTIPLEX_REPOS = 1
+# process and insert each page as soon as it is fetched, one repository at a time,
+# FETCH_WORKERS and MULTIPLEX_REPOS only apply when False
+STREAMING = False
+# fetch the histories on asyncio with up to ASYNC_CONCURRENCY requests in flight,
+# instead of FETCH_WORKERS threads or MULTIPLEX_REPOS
+ASYNC_FETCH = False
+ASYNC_CONCURRENCY = 20
+# HTTP/2 for the asyncio client, needs the h2 package
+HTTP2 = False
+# stop a forward (since) history after that many consecutive pages of commits
+# already in database, 0 disables it
+EARLY_STOP_PAGES = 0
+# fraction of a page's commits that must be known for the page to count as known
+EARLY_STOP_KNOWN_RATIO = 1.0
+# ask Github the head commit of every tracked branch first and skip the repositories
+# whose head did not move since the last run, needs repository.lastSeenHeadOid
+HEAD_OID_PREPASS = False
+# number of repositories per head commit query
+HEAD_OID_BATCH_SIZE = 100
+# metrics of the run are always logged at the end, and also written to this file
+# for the Prometheus node_exporter textfile collector when it is set
+METRICS_TEXTFILE_PATH = os.getenv("FETCH_COMMITS_METRICS_TEXTFILE")
+# where the streaming mode keeps the cursor of its last inserted page per history
+CHECKPOINT_PATH = os.path.join(os.path.dirname(__file__), "checkpoint.json")
 
 logger = get_logger(name="FetchCommitsLogger", env=ENV)
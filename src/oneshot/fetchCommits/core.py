@@ -1,30 +1,423 @@
-from logging import Logger
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from logging import DEBUG, Logger
+from operator import attrgetter
+from typing import Awaitable, Callable, Iterator, TypeVar
 
-from _interface import DateTimeFormat, GithubClient, MysqlClient, transform_datetime
-from config import SILENT
+from _interface import (
+    AsyncGithubClient,
+    DateTimeFormat,
+    GithubClient,
+    GithubServerTimeoutError,
+    JobMetrics,
+    MysqlClient,
+    transform_datetime,
+)
+from config import (
+    ADAPTIVE_PAGE_SIZE,
+    EARLY_STOP_KNOWN_RATIO,
+    EARLY_STOP_PAGES,
+    EXISTENCE_CHECK_CHUNK_SIZE,
+    FETCH_WORKERS,
+    HEAD_OID_BATCH_SIZE,
+    HEAD_OID_PREPASS,
+    INSERT_BATCH_SIZE,
+    MIN_PAGE_SIZE,
+    MULTIPLEX_REPOS,
+    PAGE_SIZE,
+    SILENT,
+    STREAMING,
+    USER_LOOKUP_CHUNK_SIZE,
+)
+
+GITHUB_MAX_PAGE_SIZE = 100
+EPOCH = "1970-01-01T00:00:00Z"
+# MIN/MAX(committedDate) GROUP BY repositoryId reads only this index when it exists
+COMMIT_BOUNDS_INDEX = ["repositoryId", "committedDate"]
+
+T = TypeVar("T")
+
+
+class PageSize:
+    """Page size of the history queries of one repository, with its stats.
+
+    In adaptive mode the size is halved, down to min_size, when Github times
+    out or fails to answer, and doubled back, up to size, after each success.
+    """
+
+    def __init__(
+        self,
+        size: int = PAGE_SIZE,
+        min_size: int = MIN_PAGE_SIZE,
+        adaptive: bool = ADAPTIVE_PAGE_SIZE,
+    ) -> None:
+        if not 1 <= min_size <= size <= GITHUB_MAX_PAGE_SIZE:
+            raise ValueError(
+                f"page sizes must verify 1 <= {min_size=} <= {size=} <= {GITHUB_MAX_PAGE_SIZE}"
+            )
+        self.max_size = size
+        self.min_size = min_size
+        self.adaptive = adaptive
+        self.current = size
+        self.pages = 0
+        self.shrinks = 0
+        self.total_latency = 0.0
+
+    def can_shrink(self) -> bool:
+        return self.adaptive and self.current > self.min_size
+
+    def shrink(self):
+        self.current = max(self.min_size, self.current // 2)
+        self.shrinks += 1
+
+    def record_success(self, latency: float):
+        self.pages += 1
+        self.total_latency += latency
+        if self.adaptive:
+            self.current = min(self.max_size, self.current * 2)
+
+    def average_latency(self) -> float:
+        return self.total_latency / self.pages if self.pages else 0.0
+
+
+class HistoryCursor:
+    """Pagination state of one direction of a repository history."""
+
+    def __init__(
+        self, repo: dict[str, object], since: str = "", until: str = ""
+    ) -> None:
+        self.repo_id = str(repo["id"])
+        self.owner_name = str(repo["ownerLogin"])
+        self.name = str(repo["name"])
+        self.ref = str(repo["trackedBranchRef"])
+        self.since = since
+        self.until = until
+        self.end_cursor: str | None = None
+        self.has_next_page = True
+        # consecutive pages made only of commits already in database
+        self.known_pages = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.repo_id}|{self.since}|{self.until}"
+
+
+@dataclass(slots=True)
+class CommitRecord:
+    """One commit, laid out as the columns of the commit table.
+
+    Built once from the GraphQL node when a page is parsed. authorId and
+    committerId hold the Github user ids until insert_repo_commits keeps
+    only the ones found on Github.
+    """
+
+    id: str
+    repositoryId: str
+    additions: int
+    deletions: int
+    authoredDate: str
+    authorAvatarUrl: str | None
+    authorEmail: str | None
+    authorId: str | None
+    authorName: str | None
+    committedDate: str
+    committerAvatarUrl: str | None
+    committerEmail: str | None
+    committerId: str | None
+    committerName: str | None
+
+    @classmethod
+    def from_node(cls, node: dict, repo_id: str) -> "CommitRecord":
+        author = node["author"] if isinstance(node["author"], dict) else dict()
+        committer = node["committer"] if isinstance(node["committer"], dict) else dict()
+        author_user = author.get("user")
+        committer_user = committer.get("user")
+        return cls(
+            id=str(node["id"]),
+            repositoryId=repo_id,
+            additions=node["additions"],
+            deletions=node["deletions"],
+            authoredDate=transform_datetime(
+                date=str(node["authoredDate"]),
+                input_format=DateTimeFormat.github,
+                output_formt=DateTimeFormat.bp_co_long,
+            ),
+            authorAvatarUrl=author.get("avatarUrl"),
+            authorEmail=author.get("email"),
+            authorId=author_user["id"] if author_user else None,
+            authorName=author.get("name"),
+            committedDate=transform_datetime(
+                date=str(node["committedDate"]),
+                input_format=DateTimeFormat.github,
+                output_formt=DateTimeFormat.bp_co_long,
+            ),
+            committerAvatarUrl=committer.get("avatarUrl"),
+            committerEmail=committer.get("email"),
+            committerId=committer_user["id"] if committer_user else None,
+            committerName=committer.get("name"),
+        )
+
+
+COMMIT_COLUMNS = [field.name for field in fields(CommitRecord)]
+# dataclasses.astuple deep copies every field, this only reads them
+commit_row = attrgetter(*COMMIT_COLUMNS)
+
+
+class CursorCheckpoint:
+    """Last committed page of each history cursor, persisted in a JSON file.
+
+    A cursor is saved once the commits of its page are in database and
+    removed once its exhausted history is in database too, so that a
+    restarted job resumes the interrupted histories instead of fetching them
+    again.
+    """
+
+    def __init__(self, path: str, logger: Logger) -> None:
+        self.path = path
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.state: dict[str, dict[str, str]] = dict()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.state = json.load(f)
+            self.logger.info(
+                f"Loaded {len(self.state)} history checkpoints from {self.path}"
+            )
+
+    def dump(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def save(self, cursor: HistoryCursor):
+        with self.lock:
+            self.state[cursor.key] = {
+                "repositoryId": cursor.repo_id,
+                "since": cursor.since,
+                "until": cursor.until,
+                "endCursor": str(cursor.end_cursor),
+            }
+            self.dump()
+
+    def clear(self, cursor: HistoryCursor):
+        with self.lock:
+            if self.state.pop(cursor.key, None) is not None:
+                self.dump()
+
+    def pending_repo_ids(self) -> set[str]:
+        with self.lock:
+            return {state["repositoryId"] for state in self.state.values()}
+
+    def resume(
+        self, repo: dict[str, object], cursors: list[HistoryCursor]
+    ) -> list[HistoryCursor]:
+        """Merge the saved cursors of repo with the freshly computed ones.
+
+        A fresh cursor is dropped when a saved one already covers its range:
+        same bounds, or any backward history when a backward or a full
+        (since EPOCH) history is being resumed.
+        """
+        with self.lock:
+            saved = [
+                state
+                for state in self.state.values()
+                if state["repositoryId"] == str(repo["id"])
+            ]
+        resumed: list[HistoryCursor] = list()
+        for state in saved:
+            cursor = HistoryCursor(
+                repo=repo, since=state["since"], until=state["until"]
+            )
+            cursor.end_cursor = state["endCursor"]
+            resumed.append(cursor)
+            self.logger.info(
+                f"Resuming history of {cursor.repo_id=} from {cursor.end_cursor=}, {cursor.since=}, {cursor.until=}"
+            )
+        resumed_keys = {cursor.key for cursor in resumed}
+        covers_backward = any(
+            cursor.until or cursor.since == EPOCH for cursor in resumed
+        )
+        kept = [
+            cursor
+            for cursor in cursors
+            if cursor.key not in resumed_keys and not (cursor.until and covers_backward)
+        ]
+        return kept + resumed
 
 
 class CommitsFetcher:
     def __init__(
-        self, mysql_client: MysqlClient, github_client: GithubClient, logger: Logger
+        self,
+        mysql_client: MysqlClient,
+        github_client: GithubClient,
+        logger: Logger,
+        workers: int = FETCH_WORKERS,
+        mysql_client_factory: Callable[[], MysqlClient] | None = None,
+        github_client_factory: Callable[[], GithubClient] | None = None,
+        multiplex: int = MULTIPLEX_REPOS,
+        streaming: bool = STREAMING,
+        checkpoint: CursorCheckpoint | None = None,
+        silent: bool = SILENT,
+        early_stop_pages: int = EARLY_STOP_PAGES,
+        early_stop_known_ratio: float = EARLY_STOP_KNOWN_RATIO,
+        head_oid_prepass: bool = HEAD_OID_PREPASS,
+        metrics: JobMetrics | None = None,
     ) -> None:
         self.mysql_client = mysql_client
         self.github_client = github_client
         self.logger = logger
+        # pymysql connections and requests sessions are not thread-safe, so with
+        # more than one worker each thread gets its own clients from the factories,
+        # the Github ones sharing the rate limit budget of the token and a pooled
+        # Mysql one being shared as is
+        self.workers = workers
+        self.mysql_client_factory = (
+            mysql_client_factory
+            if mysql_client_factory
+            else lambda: (
+                self.mysql_client
+                if self.mysql_client.pool
+                else MysqlClient(logger=self.logger)
+            )
+        )
+        self.github_client_factory = (
+            github_client_factory
+            if github_client_factory
+            else lambda: GithubClient(
+                logger=self.logger,
+                token=self.github_client.token,
+                rate_limiter=self.github_client.rate_limiter,
+                max_retries=self.github_client.max_retries,
+                backoff_base=self.github_client.backoff_base,
+                backoff_max=self.github_client.backoff_max,
+                timeout=self.github_client.timeout,
+                url=self.github_client.url,
+                stats=self.github_client.stats,
+            )
+        )
+        self.worker_clients = threading.local()
+        # above 1, histories of that many repositories share each request
+        self.multiplex = multiplex
+        self.worker_clients_lock = threading.Lock()
+        self.worker_clients_ls: list[tuple[MysqlClient, GithubClient]] = list()
+        # without a pool the Mysql client has a single connection, so the
+        # database calls of the asyncio tasks go one at a time, see run_blocking
+        self.mysql_lock = asyncio.Lock()
         self.repos: list[dict[str, object]] = list()
-        self.commits: dict[str, list[dict[str, object]]] = dict()
+        self.commits: dict[str, list[CommitRecord]] = dict()
         self.github_users_id: set[str] = set()
         self.github_users: dict[str, dict[str, object]] = dict()
+        self.github_users_not_found: set[str] = set()
+        # newest/oldest committedDate of each repo with commits, filled with
+        # one grouped query by fetch_repos, None until then
+        self.commit_bounds: dict[str, dict[str, object]] | None = None
+        # page by page processing, see work_streaming
+        self.streaming = streaming
+        # saved after each inserted page in streaming mode, read in both modes
+        self.checkpoint = checkpoint
+        # exhausted histories, cleared from the checkpoint once their commits
+        # are in database, see finish_history
+        self.finished_cursors: list[HistoryCursor] = list()
+        self.finished_cursors_lock = threading.Lock()
+        # when True, queries and responses are not logged even at DEBUG level
+        self.silent = silent
+        # see stop_on_known_pages
+        self.early_stop_pages = early_stop_pages
+        self.early_stop_known_ratio = early_stop_known_ratio
+        # head commit of the tracked branch of each repo, see skip_unchanged_repos
+        self.head_oid_prepass = head_oid_prepass
+        self.head_oids: dict[str, str | None] = dict()
+        # stage wall times, rows written and fetch time per repository
+        self.metrics = metrics if metrics else JobMetrics(job="fetchCommits")
 
     def work(self) -> int:
-        self.fetch_repos()
-        self.fetch_commits()
-        self.extract_users()
-        self.add_missing_user_in_db()
-        tot = self.add_commits_to_database()
-        self.update_root_is_reached()
+        if self.streaming:
+            return self.work_streaming()
+        with self.metrics.stage("fetch_repos"):
+            self.fetch_repos()
+        with self.metrics.stage("fetch_commits"):
+            self.fetch_commits()
+        return self.store_commits()
+
+    async def work_async(self, github_client: AsyncGithubClient) -> int:
+        """Same stages as work, with the histories fetched by fetch_commits_async."""
+        with self.metrics.stage("fetch_repos"):
+            self.fetch_repos()
+        with self.metrics.stage("fetch_commits"):
+            await self.fetch_commits_async(github_client=github_client)
+        return self.store_commits()
+
+    def store_commits(self) -> int:
+        """Stages of work following the fetch of the histories."""
+        with self.metrics.stage("extract_users"):
+            self.extract_users()
+        with self.metrics.stage("add_missing_user_in_db"):
+            self.add_missing_user_in_db()
+        with self.metrics.stage("add_commits_to_database"):
+            tot = self.add_commits_to_database()
+        self.clear_finished_histories()
+        with self.metrics.stage("update_root_is_reached"):
+            self.update_root_is_reached()
+        with self.metrics.stage("save_head_oids"):
+            self.save_head_oids()
+        return tot
+
+    def work_streaming(self) -> int:
+        """Run the job page by page instead of stage by stage.
+
+        Each fetched page goes through user extraction, user insertion and
+        commit insertion before the next one is requested, so memory stays
+        flat and a crash loses at most one page of work. The time of each
+        stage is the sum over the pages.
+        """
+        with self.metrics.stage("fetch_repos"):
+            self.fetch_repos()
+        tot = 0
+        for repo in self.repos:
+            repo_id = str(repo["id"])
+            pages = self.iter_repo_pages(
+                repo=repo,
+                mysql_client=self.mysql_client,
+                github_client=self.github_client,
+            )
+            while True:
+                with self.metrics.stage("fetch_commits"):
+                    page = next(pages, None)
+                if page is None:
+                    break
+                cursor, commits = page
+                with self.metrics.stage("extract_users"):
+                    user_ids = self.extract_commit_users(commits)
+                with self.metrics.stage("add_missing_user_in_db"):
+                    self.add_missing_users(user_ids=user_ids)
+                with self.metrics.stage("add_commits_to_database"):
+                    tot += self.insert_repo_commits(repo_id=repo_id, commits=commits)
+                if not self.checkpoint:
+                    continue
+                if cursor.has_next_page:
+                    self.checkpoint.save(cursor)
+                else:
+                    self.checkpoint.clear(cursor)
+            with self.metrics.stage("update_root_is_reached"):
+                self.update_root_is_reached(repo_ids=[repo_id])
+            with self.metrics.stage("save_head_oids"):
+                self.save_head_oids(repo_ids=[repo_id])
         return tot
 
+    def record_github_stats(self):
+        # shared by the worker and asyncio clients, see github_client_factory
+        stats = self.github_client.stats
+        self.metrics.set_counter("github_requests", stats.requests)
+        self.metrics.set_counter("github_retries", stats.retries)
+        self.metrics.set_counter("github_bytes_received", stats.bytes_received)
+        self.metrics.set_counter("github_graphql_cost", stats.cost)
+
     def fetch_repos(self):
         self.logger.info("Fetching repositories from database")
         # TODO: Also get owner name and repo name
@@ -39,8 +432,9 @@ class CommitsFetcher:
                     "ownerIsOrganization",
                     "rootCommitIsReached",
                     "trackedBranchRef",
-                ],
-                silent=SILENT,
+                ]
+                + (["lastSeenHeadOid"] if self.head_oid_prepass else list()),
+                silent=self.silent,
             )
             owners: list[dict[str, object]] = list()
             organization_ids = [
@@ -53,7 +447,7 @@ class CommitsFetcher:
                     table_name="git_organization",
                     select_col=["id", "login"],
                     cond_in={"id": organization_ids},
-                    silent=SILENT,
+                    silent=self.silent,
                 )
             )
             user_ids = [
@@ -64,7 +458,7 @@ class CommitsFetcher:
                     table_name="git_user",
                     select_col=["id", "login"],
                     cond_in={"id": user_ids},
-                    silent=SILENT,
+                    silent=self.silent,
                 )
             )
             owner_map = {owner["id"]: owner["login"] for owner in owners}
@@ -85,151 +479,243 @@ class CommitsFetcher:
             self.logger.error(f"could not fetch the repositories, {type(e)=} {str(e)=}")
             raise e
         self.logger.info(f"Fetched {len(self.repos)} repositories")
+        if self.head_oid_prepass:
+            self.skip_unchanged_repos()
+        self.fetch_commit_bounds()
 
-    def update_root_is_reached(self):
-        self.logger.info("updating rootCommitIsReached of repos")
-        for repo_id in self.commits:
-            self.logger.debug(f"updating rootCommitIsReached of {repo_id=}")
-            self.mysql_client.update_by_id(
-                table_name="repository", id=repo_id, values={"rootCommitIsReached": "1"}
+    def get_head_oids(self, repos: list[dict[str, object]]) -> dict[str, str | None]:
+        """Fetch the head commit of the tracked branch of repos with one aliased query.
+
+        Repositories or branches that cannot be resolved map to None.
+        """
+        selections = [
+            f"""h{i}: repository(owner: "{repo["ownerLogin"]}", name: "{repo["name"]}") {{
+                    ref(qualifiedName: "{repo["trackedBranchRef"]}") {{
+                        target {{
+                            oid
+                        }}
+                    }}
+                }}
+                """
+            for i, repo in enumerate(repos)
+        ]
+        query = f"""
+            query {{
+                {"".join(selections)}
+            }}"""
+        resp = self.github_client.graphql_post(query=query, silent=self.silent)
+        head_oids: dict[str, str | None] = dict()
+        for i, repo in enumerate(repos):
+            repository = resp.get(f"h{i}")
+            ref = repository["ref"] if repository else None
+            head_oids[str(repo["id"])] = str(ref["target"]["oid"]) if ref else None
+        return head_oids
+
+    def skip_unchanged_repos(self):
+        """Drop from self.repos the repositories with nothing to fetch.
+
+        Those are the ones whose head is the one stored by the last run, whose
+        root is reached and with no interrupted history to resume.
+        """
+        self.logger.info("Fetching head commits of repositories")
+        for start in range(0, len(self.repos), HEAD_OID_BATCH_SIZE):
+            self.head_oids.update(
+                self.get_head_oids(
+                    repos=self.repos[start : start + HEAD_OID_BATCH_SIZE]
+                )
             )
+        resuming = self.checkpoint.pending_repo_ids() if self.checkpoint else set()
+        changed_repos: list[dict[str, object]] = list()
+        for repo in self.repos:
+            repo_id = str(repo["id"])
+            head_oid = self.head_oids.get(repo_id)
+            if (
+                head_oid is not None
+                and head_oid == repo["lastSeenHeadOid"]
+                and str(repo["rootCommitIsReached"]) == "1"
+                and repo_id not in resuming
+            ):
+                continue
+            changed_repos.append(repo)
+        self.logger.info(
+            f"Skipping {len(self.repos) - len(changed_repos)} repositories whose head did not move, {len(changed_repos)} left"
+        )
+        self.repos = changed_repos
+
+    def save_head_oids(self, repo_ids: list[str] | None = None):
+        """Store the head commits fetched by the pre-pass, once the commits of
+        the repos are in database."""
+        if not self.head_oid_prepass:
+            return
+        for repo_id in repo_ids if repo_ids is not None else self.commits:
+            head_oid = self.head_oids.get(repo_id)
+            if head_oid is None:
+                continue
+            updated = self.mysql_client.update_where(
+                table_name="repository",
+                update_col_value={"lastSeenHeadOid": head_oid},
+                cond_eq={"id": repo_id},
+                silent=self.silent,
+            )
+            self.metrics.count("repository_rows_written", updated)
+
+    def update_root_is_reached(self, repo_ids: list[str] | None = None):
+        self.logger.info("updating rootCommitIsReached of repos")
+        ids = list(repo_ids if repo_ids is not None else self.commits)
+        updated = self.mysql_client.update_many(
+            table_name="repository",
+            ids=ids,
+            values={"rootCommitIsReached": "1"},
+            silent=self.silent,
+        )
+        self.metrics.count("repository_rows_written", updated)
+        self.logger.debug(
+            f"updated rootCommitIsReached of {updated} repos over {len(ids)}"
+        )
 
     def add_commits_to_database(self) -> int:
         self.logger.info("Adding commits to database")
         tot = 0
         for repo_id, commits in self.commits.items():
-            self.logger.debug(f"Adding commits to {repo_id=}")
-            cnt = 0
-            for commit in commits:
-                self.logger.debug("Checking if commit is already in database")
-                if self.mysql_client.id_exists(
-                    table_name="commit", id=str(commit["id"]), silent=SILENT
-                ):
-                    self.logger.debug(f"Found already existing commit {commit['id']}")
-                    continue
-                cnt += 1
-                self.logger.debug(f"gathering {commit=} information")
-                commit["repositoryId"] = repo_id
-
-                author = commit["author"]
-                id_author = None
-                commit["authorAvatarUrl"] = None
-                commit["authorEmail"] = None
-                commit["authorName"] = None
-                commit["authoredDate"] = transform_datetime(
-                    date=str(commit["authoredDate"]),
-                    input_format=DateTimeFormat.github,
-                    output_formt=DateTimeFormat.bp_co_long,
-                )
-                if isinstance(author, dict):
-                    commit["authorAvatarUrl"] = author["avatarUrl"]
-                    commit["authorEmail"] = author["email"]
-                    commit["authorName"] = author["name"]
-                    if author["user"]:
-                        id_author = author["user"]["id"]
-                if id_author:
-                    self.logger.debug(f"existing user, {self.github_users[id_author]}")
-                    commit["authorAvatarUrl"] = str(
-                        self.github_users[id_author]["avatarUrl"]
-                    )
-                    commit["authorEmail"] = str(self.github_users[id_author]["email"])
-                    commit["authorName"] = (
-                        str(self.github_users[id_author]["login"])
-                        if str(self.github_users[id_author]["login"])
-                        else str(self.github_users[id_author]["name"])
-                    )
-                commit["authorId"] = id_author
-
-                committer = commit["committer"]
-                id_committer = None
-                commit["committerAvatarUrl"] = None
-                commit["committerEmail"] = None
-                commit["committerName"] = None
-                commit["committedDate"] = transform_datetime(
-                    date=str(commit["committedDate"]),
-                    input_format=DateTimeFormat.github,
-                    output_formt=DateTimeFormat.bp_co_long,
-                )
-                if isinstance(committer, dict):
-                    commit["committerAvatarUrl"] = committer["avatarUrl"]
-                    commit["committerEmail"] = committer["email"]
-                    commit["committerName"] = committer["name"]
-                    if committer["user"]:
-                        id_committer = committer["user"]["id"]
-                if id_committer:
-                    self.logger.debug(
-                        f"existing user, {self.github_users[id_committer]}"
-                    )
-                    commit["committerAvatarUrl"] = str(
-                        self.github_users[id_committer]["avatarUrl"]
-                    )
-                    commit["committerEmail"] = str(
-                        self.github_users[id_committer]["email"]
-                    )
-                    commit["committerName"] = (
-                        str(self.github_users[id_committer]["login"])
-                        if str(self.github_users[id_committer]["login"])
-                        else str(self.github_users[id_committer]["name"])
-                    )
-                commit["committerId"] = id_committer
-
-                columns = [
-                    "id",
-                    "repositoryId",
-                    "additions",
-                    "deletions",
-                    "authoredDate",
-                    "authorAvatarUrl",
-                    "authorEmail",
-                    "authorId",
-                    "authorName",
-                    "committedDate",
-                    "committerAvatarUrl",
-                    "committerEmail",
-                    "committerId",
-                    "committerName",
-                ]
-                commit_to_insert = {col: commit[col] for col in columns}
-                self.logger.debug(f"Inserting {commit_to_insert} in db")
-                self.mysql_client.insert_one(
-                    table_name="commit",
-                    values=commit_to_insert,
-                    silent=SILENT,
-                )
-            tot += cnt
+            tot += self.insert_repo_commits(repo_id=repo_id, commits=commits)
         return tot
 
+    def insert_repo_commits(self, repo_id: str, commits: list[CommitRecord]) -> int:
+        self.logger.debug(f"Adding commits to {repo_id=}")
+        commits_to_insert: list[tuple] = list()
+        self.logger.debug("Checking which commits are already in database")
+        seen_ids = self.mysql_client.existing_ids(
+            table_name="commit",
+            ids=[commit.id for commit in commits],
+            chunk_size=EXISTENCE_CHECK_CHUNK_SIZE,
+            silent=self.silent,
+        )
+        self.logger.debug("Found %d already existing commits", len(seen_ids))
+        debug = self.logger.isEnabledFor(DEBUG)
+        for commit in commits:
+            if commit.id in seen_ids:
+                continue
+            seen_ids.add(commit.id)
+            if debug:
+                self.logger.debug("gathering commit=%r information", commit)
+            (
+                commit.authorId,
+                commit.authorAvatarUrl,
+                commit.authorEmail,
+                commit.authorName,
+            ) = self.git_user_identity(
+                user_id=commit.authorId,
+                avatar_url=commit.authorAvatarUrl,
+                email=commit.authorEmail,
+                name=commit.authorName,
+            )
+            (
+                commit.committerId,
+                commit.committerAvatarUrl,
+                commit.committerEmail,
+                commit.committerName,
+            ) = self.git_user_identity(
+                user_id=commit.committerId,
+                avatar_url=commit.committerAvatarUrl,
+                email=commit.committerEmail,
+                name=commit.committerName,
+            )
+            commits_to_insert.append(commit_row(commit))
+        if not commits_to_insert:
+            return 0
+        self.logger.debug(f"Inserting {len(commits_to_insert)} commits in db")
+        batch_counts = self.mysql_client.insert_many(
+            table_name="commit",
+            rows=commits_to_insert,
+            columns=COMMIT_COLUMNS,
+            batch_size=INSERT_BATCH_SIZE,
+            silent=self.silent,
+        )
+        self.metrics.count("commit_rows_written", len(commits_to_insert))
+        self.logger.debug(f"Inserted commits of {repo_id=} with {batch_counts=}")
+        return len(commits_to_insert)
+
+    def git_user_identity(
+        self,
+        user_id: str | None,
+        avatar_url: str | None,
+        email: str | None,
+        name: str | None,
+    ) -> tuple[str | None, str | None, str | None, str | None]:
+        """Return (id, avatarUrl, email, name) to store for a commit author or
+        committer, taken from its Github user when found, from git otherwise."""
+        if not user_id:
+            return None, avatar_url, email, name
+        if user_id not in self.github_users:
+            self.logger.debug("user %s not found on Github", user_id)
+            return None, avatar_url, email, name
+        user = self.github_users[user_id]
+        self.logger.debug("existing user, %s", user)
+        return (
+            user_id,
+            str(user["avatarUrl"]),
+            str(user["email"]),
+            str(user["login"]) if str(user["login"]) else str(user["name"]),
+        )
+
     def add_missing_user_in_db(self):
         self.logger.info(f"Adding missing users in database")
+        self.add_missing_users(user_ids=self.github_users_id)
+
+    def add_missing_users(self, user_ids: set[str]):
+        # users already loaded or already looked up in vain are skipped
+        unknown_ids = user_ids.difference(
+            self.github_users, self.github_users_not_found
+        )
+        if not unknown_ids:
+            return
         res = self.mysql_client.select(
             table_name="git_user",
             select_col=["id", "avatarUrl", "email", "name", "login"],
-            cond_in={"id": list(self.github_users_id)},
-            silent=SILENT,
+            cond_in={"id": list(unknown_ids)},
+            silent=self.silent,
         )
         for user in res:
             self.github_users[str(user["id"])] = user
-        existing_ids = {id for id in self.github_users}
-        missing_ids = self.github_users_id.difference(existing_ids)
+        missing_ids = unknown_ids.difference(self.github_users)
         self.logger.info(
-            f"Over the {len(self.github_users_id)} git users, {len(missing_ids)} are not in Database. Fetching github api"
-        )
-        for id in missing_ids:
-            self.logger.debug(f"Fetching {id=}")
-            user_info = self.get_git_user_info(id=id)
-            user_info["id"] = id
-            self.github_users[id] = user_info
-            self.logger.debug(f"Got {user_info}, inserting into database")
-            self.mysql_client.insert_one(
-                table_name="git_user", values=user_info, silent=SILENT
+            f"Over the {len(unknown_ids)} git users, {len(missing_ids)} are not in Database. Fetching github api"
+        )
+        missing_ids_ls = sorted(missing_ids)
+        for start in range(0, len(missing_ids_ls), USER_LOOKUP_CHUNK_SIZE):
+            chunk = missing_ids_ls[start : start + USER_LOOKUP_CHUNK_SIZE]
+            self.logger.debug(f"Fetching {len(chunk)} users")
+            users_info = self.get_git_users_info(ids=chunk)
+            self.github_users_not_found.update(set(chunk).difference(users_info))
+            not_found = len(chunk) - len(users_info)
+            if not_found:
+                self.logger.info(
+                    f"{not_found} users could not be found on Github, they are left out"
+                )
+            if not users_info:
+                continue
+            self.github_users.update(users_info)
+            self.logger.debug(f"Inserting {len(users_info)} users into database")
+            self.mysql_client.insert_many(
+                table_name="git_user",
+                rows=list(users_info.values()),
+                batch_size=INSERT_BATCH_SIZE,
+                silent=self.silent,
             )
+            self.metrics.count("git_user_rows_written", len(users_info))
             self.logger.debug("Insertion done")
 
-    def get_git_user_info(self, id: str) -> dict[str, object]:
+    def get_git_users_info(self, ids: list[str]) -> dict[str, dict[str, object]]:
+        """Fetch the info of up to 100 Github users in one request.
+
+        Deleted users come back as null nodes and other actors (bots,
+        mannequins) as nodes without login, both are left out of the result.
+        """
         query = f"""
             query {{
-                node(id:"{id}") {{
+                nodes(ids: [{", ".join(f'"{id}"' for id in ids)}]) {{
                     ... on User {{
+                        id
                         avatarUrl
                         email
                         name
@@ -238,10 +724,114 @@ class CommitsFetcher:
                 }}
             }}
         """
-        res = self.github_client.graphql_post(query=query, silent=SILENT)
-        return res["node"]
+        res = self.github_client.graphql_post(query=query, silent=self.silent)
+        users_info: dict[str, dict[str, object]] = dict()
+        for id, node in zip(ids, res["nodes"]):
+            if not node or not node.get("login"):
+                self.logger.debug(f"No Github user found for {id=}")
+                continue
+            users_info[id] = {
+                "id": id,
+                "avatarUrl": node["avatarUrl"],
+                "email": node["email"],
+                "name": node["name"],
+                "login": node["login"],
+            }
+        return users_info
 
-    def get_next_commits(
+    def with_adaptive_page_size(
+        self,
+        page_size: PageSize,
+        label: str,
+        fetch: Callable[[int, bool], T],
+    ) -> T:
+        """Call fetch(first, retry_on_server_error), shrinking the page on failure."""
+        while True:
+            start = time.perf_counter()
+            try:
+                res = fetch(page_size.current, not page_size.can_shrink())
+            except GithubServerTimeoutError:
+                if not page_size.can_shrink():
+                    raise
+                page_size.shrink()
+                self.logger.warning(
+                    f"Github failed on {label}, retrying with a page size of {page_size.current}"
+                )
+                continue
+            page_size.record_success(latency=time.perf_counter() - start)
+            return res
+
+    def get_next_commits_adaptive(
+        self,
+        github_client: GithubClient,
+        page_size: PageSize,
+        cursor: HistoryCursor,
+    ) -> list[CommitRecord]:
+        commits, cursor.end_cursor, cursor.has_next_page = self.with_adaptive_page_size(
+            page_size=page_size,
+            label=f"{cursor.owner_name}/{cursor.name}",
+            fetch=lambda first, retry_on_server_error: self.get_next_commits(
+                github_client=github_client,
+                repo_id=cursor.repo_id,
+                owner_name=cursor.owner_name,
+                name=cursor.name,
+                ref=cursor.ref,
+                end_cursor=cursor.end_cursor,
+                since=cursor.since,
+                until=cursor.until,
+                first=first,
+                retry_on_server_error=retry_on_server_error,
+            ),
+        )
+        return commits
+
+    async def with_adaptive_page_size_async(
+        self,
+        page_size: PageSize,
+        label: str,
+        fetch: Callable[[int, bool], Awaitable[T]],
+    ) -> T:
+        """Await fetch(first, retry_on_server_error), shrinking the page on failure."""
+        while True:
+            start = time.perf_counter()
+            try:
+                res = await fetch(page_size.current, not page_size.can_shrink())
+            except GithubServerTimeoutError:
+                if not page_size.can_shrink():
+                    raise
+                page_size.shrink()
+                self.logger.warning(
+                    f"Github failed on {label}, retrying with a page size of {page_size.current}"
+                )
+                continue
+            page_size.record_success(latency=time.perf_counter() - start)
+            return res
+
+    async def get_next_commits_async(
+        self,
+        github_client: AsyncGithubClient,
+        cursor: HistoryCursor,
+        first: int = PAGE_SIZE,
+        retry_on_server_error: bool = True,
+    ) -> tuple[list[CommitRecord], str, bool]:
+        selection = self.repository_history_selection(
+            owner_name=cursor.owner_name,
+            name=cursor.name,
+            ref=cursor.ref,
+            end_cursor=cursor.end_cursor,
+            since=cursor.since,
+            until=cursor.until,
+            first=first,
+        )
+        query = f"""
+            query {{{selection}
+            }}"""
+        resp = await github_client.graphql_post(
+            query=query, silent=self.silent, retry_on_server_error=retry_on_server_error
+        )
+        return self.parse_history(resp["repository"], repo_id=cursor.repo_id)
+
+    def repository_history_selection(
         self,
         owner_name: str,
         name: str,
@@ -249,7 +839,8 @@ class CommitsFetcher:
         end_cursor: str | None,
         since: str = "",
         until: str = "",
-    ) -> tuple[list[dict[str, object]], str, bool]:
+        first: int = PAGE_SIZE,
+    ) -> str:
         if end_cursor is None:
             end_cursor = "null"
         else:
@@ -258,13 +849,12 @@ class CommitsFetcher:
             since = ', since:"' + since + '"'
         if until:
             until = ', until:"' + until + '"'
-        query = f"""
-            query {{
+        return f"""
                 repository(owner: "{owner_name}", name: "{name}") {{
                     ref(qualifiedName: "{ref}") {{
                         target {{
                             ... on Commit {{
-                                history(first: 10, after:{end_cursor}{since}{until}) {{
+                                history(first: {first}, after:{end_cursor}{since}{until}) {{
                                     pageInfo {{
                                         hasNextPage
                                         endCursor
@@ -296,126 +886,473 @@ class CommitsFetcher:
                             }}
                         }}
                     }}
-                }}
-            }}"""
-        resp = self.github_client.graphql_post(query=query, silent=SILENT)[
-            "repository"
-        ]["ref"]["target"]["history"]
-        commits = resp["nodes"]
+                }}"""
+
+    def parse_history(
+        self, repository: dict, repo_id: str
+    ) -> tuple[list[CommitRecord], str, bool]:
+        resp = repository["ref"]["target"]["history"]
+        commits = [CommitRecord.from_node(node, repo_id) for node in resp["nodes"]]
         end_cursor = str(resp["pageInfo"]["endCursor"])
         has_next_page = resp["pageInfo"]["hasNextPage"]
         return commits, end_cursor, has_next_page
 
+    def get_next_commits(
+        self,
+        github_client: GithubClient,
+        repo_id: str,
+        owner_name: str,
+        name: str,
+        ref: str,
+        end_cursor: str | None,
+        since: str = "",
+        until: str = "",
+        first: int = PAGE_SIZE,
+        retry_on_server_error: bool = True,
+    ) -> tuple[list[CommitRecord], str, bool]:
+        selection = self.repository_history_selection(
+            owner_name=owner_name,
+            name=name,
+            ref=ref,
+            end_cursor=end_cursor,
+            since=since,
+            until=until,
+            first=first,
+        )
+        query = f"""
+            query {{{selection}
+            }}"""
+        resp = github_client.graphql_post(
+            query=query, silent=self.silent, retry_on_server_error=retry_on_server_error
+        )
+        return self.parse_history(resp["repository"], repo_id=repo_id)
+
+    def get_next_commits_multiplexed(
+        self,
+        github_client: GithubClient,
+        cursors: list[HistoryCursor],
+        first: int = PAGE_SIZE,
+        retry_on_server_error: bool = True,
+    ) -> list[tuple[list[CommitRecord], str, bool]]:
+        """Fetch the next page of several histories with one aliased query."""
+        selections = [
+            f"r{i}: "
+            + self.repository_history_selection(
+                owner_name=cursor.owner_name,
+                name=cursor.name,
+                ref=cursor.ref,
+                end_cursor=cursor.end_cursor,
+                since=cursor.since,
+                until=cursor.until,
+                first=first,
+            ).strip()
+            + "\n"
+            for i, cursor in enumerate(cursors)
+        ]
+        query = f"""
+            query {{
+                {"".join(selections)}
+            }}"""
+        resp = github_client.graphql_post(
+            query=query, silent=self.silent, retry_on_server_error=retry_on_server_error
+        )
+        return [
+            self.parse_history(resp[f"r{i}"], repo_id=cursor.repo_id)
+            for i, cursor in enumerate(cursors)
+        ]
+
     def fetch_commits(self):
+        if self.multiplex > 1:
+            self.fetch_commits_multiplexed()
+            return
+
+        if self.workers <= 1:
+            for repo in self.repos:
+                self.commits[str(repo["id"])] = self.fetch_repo_commits(
+                    repo=repo,
+                    mysql_client=self.mysql_client,
+                    github_client=self.github_client,
+                )
+            return
+
+        self.logger.info(
+            f"Fetching commits of {len(self.repos)} repositories with {self.workers} workers"
+        )
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="fetch_commits"
+            ) as executor:
+                futures = [
+                    executor.submit(self.fetch_repo_commits_in_worker, repo)
+                    for repo in self.repos
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            self.close_worker_clients()
+        # results are gathered in submission order so self.commits follows self.repos
+        for repo, repo_commits in zip(self.repos, results):
+            self.commits[str(repo["id"])] = repo_commits
+
+    async def fetch_commits_async(self, github_client: AsyncGithubClient):
+        """Fetch the histories of all repositories concurrently on asyncio.
+
+        Pages of one history follow each other, but every history of every
+        repository runs in its own task, the number of requests in flight
+        being bounded by the client.
+        """
+        self.logger.info(
+            f"Fetching commits of {len(self.repos)} repositories, up to {github_client.max_concurrency} requests in flight"
+        )
+        results = await asyncio.gather(
+            *[
+                self.fetch_repo_commits_async(repo=repo, github_client=github_client)
+                for repo in self.repos
+            ]
+        )
+        for repo, repo_commits in zip(self.repos, results):
+            self.commits[str(repo["id"])] = repo_commits
+
+    async def run_blocking(self, function: Callable[..., T], **kwargs) -> T:
+        """Run a blocking database call in a thread, off the event loop."""
+        if self.mysql_client.pool:
+            return await asyncio.to_thread(function, **kwargs)
+        async with self.mysql_lock:
+            return await asyncio.to_thread(function, **kwargs)
+
+    async def fetch_repo_commits_async(
+        self, repo: dict[str, object], github_client: AsyncGithubClient
+    ) -> list[CommitRecord]:
+        repo_id = str(repo["id"])
+        page_size = PageSize()
+        start = time.perf_counter()
+
+        async def fetch_history(cursor: HistoryCursor) -> list[CommitRecord]:
+            history: list[CommitRecord] = list()
+            while cursor.has_next_page:
+                commits, cursor.end_cursor, cursor.has_next_page = (
+                    await self.with_adaptive_page_size_async(
+                        page_size=page_size,
+                        label=f"{cursor.owner_name}/{cursor.name}",
+                        fetch=lambda first, retry_on_server_error: self.get_next_commits_async(
+                            github_client=github_client,
+                            cursor=cursor,
+                            first=first,
+                            retry_on_server_error=retry_on_server_error,
+                        ),
+                    )
+                )
+                await self.run_blocking(
+                    self.stop_on_known_pages,
+                    cursor=cursor,
+                    commits=commits,
+                    mysql_client=self.mysql_client,
+                )
+                history.extend(commits)
+            self.finish_history(cursor)
+            return history
+
+        cursors = await self.run_blocking(
+            self.history_cursors, repo=repo, mysql_client=self.mysql_client
+        )
+        histories = await asyncio.gather(*[fetch_history(cursor) for cursor in cursors])
+        repo_commits = [commit for history in histories for commit in history]
+        self.metrics.add_duration(
+            kind="repository", key=repo_id, seconds=time.perf_counter() - start
+        )
+        self.logger.info(
+            f"Fetched a total of {len(repo_commits)} commits for {repo_id=} in {page_size.pages} pages, "
+            f"{page_size.average_latency():.3f}s per page on average"
+        )
+        return repo_commits
+
+    def fetch_commits_multiplexed(self):
+        self.logger.info(
+            f"Fetching commits of {len(self.repos)} repositories, {self.multiplex} histories per request"
+        )
+        pending: list[HistoryCursor] = list()
         for repo in self.repos:
-            # 1. Look for the first and last commit we have of the repo in the table
-            repo_id = str(repo["id"])
-            self.logger.info(
-                f"Looking into db for most and least recent commits of {repo_id=}"
+            self.commits[str(repo["id"])] = list()
+            pending.extend(
+                self.history_cursors(repo=repo, mysql_client=self.mysql_client)
             )
-            most_recent_commit = self.mysql_client.select(
-                table_name="commit",
-                select_col=["id", "committedDate"],
-                cond_eq={"repositoryId": repo_id},
-                order_by="committedDate",
-                ascending_order=False,
-                silent=SILENT,
-                limit=1,
+        page_size = PageSize()
+        while pending:
+            batch = pending[: self.multiplex]
+            start = time.perf_counter()
+            results = self.with_adaptive_page_size(
+                page_size=page_size,
+                label=f"{len(batch)} repositories",
+                fetch=lambda first, retry_on_server_error: self.get_next_commits_multiplexed(
+                    github_client=self.github_client,
+                    cursors=batch,
+                    first=first,
+                    retry_on_server_error=retry_on_server_error,
+                ),
             )
-            oldest_commit = self.mysql_client.select(
-                table_name="commit",
-                select_col=["id", "committedDate"],
-                cond_eq={"repositoryId": repo_id},
-                order_by="committedDate",
-                ascending_order=True,
-                silent=SILENT,
-                limit=1,
+            # a shared request counts in the fetch time of each of its repositories
+            latency = time.perf_counter() - start
+            for cursor, (commits, end_cursor, has_next_page) in zip(batch, results):
+                self.metrics.add_duration(
+                    kind="repository", key=cursor.repo_id, seconds=latency
+                )
+                cursor.end_cursor = end_cursor
+                cursor.has_next_page = has_next_page
+                self.stop_on_known_pages(
+                    cursor=cursor, commits=commits, mysql_client=self.mysql_client
+                )
+                self.commits[cursor.repo_id].extend(commits)
+                self.finish_history(cursor)
+                self.logger.debug(
+                    "found %d commits for cursor.repo_id=%r, next request starting from end_cursor=%r. has_next_page=%r",
+                    len(commits),
+                    cursor.repo_id,
+                    end_cursor,
+                    has_next_page,
+                )
+            # finished histories drop out of the next requests
+            pending = [cursor for cursor in pending if cursor.has_next_page]
+        self.logger.info(
+            f"Fetched a total of {sum(len(commits) for commits in self.commits.values())} commits "
+            f"in {page_size.pages} requests, {page_size.average_latency():.3f}s per request on average"
+        )
+
+    def fetch_repo_commits_in_worker(
+        self, repo: dict[str, object]
+    ) -> list[CommitRecord]:
+        if not hasattr(self.worker_clients, "mysql_client"):
+            mysql_client = self.mysql_client_factory()
+            github_client = self.github_client_factory()
+            self.worker_clients.mysql_client = mysql_client
+            self.worker_clients.github_client = github_client
+            with self.worker_clients_lock:
+                self.worker_clients_ls.append((mysql_client, github_client))
+        return self.fetch_repo_commits(
+            repo=repo,
+            mysql_client=self.worker_clients.mysql_client,
+            github_client=self.worker_clients.github_client,
+        )
+
+    def close_worker_clients(self):
+        with self.worker_clients_lock:
+            for mysql_client, github_client in self.worker_clients_ls:
+                if mysql_client is not self.mysql_client:
+                    mysql_client.close()
+                github_client.close()
+            self.worker_clients_ls = list()
+        self.worker_clients = threading.local()
+
+    def get_commit_bounds(
+        self, repo_ids: list[str], mysql_client: MysqlClient
+    ) -> dict[str, dict[str, object]]:
+        if not repo_ids:
+            return dict()
+        res = mysql_client.aggregate(
+            table_name="commit",
+            aggregates={
+                "newest": "MAX(committedDate)",
+                "oldest": "MIN(committedDate)",
+            },
+            group_by=["repositoryId"],
+            cond_in={"repositoryId": repo_ids},
+            silent=self.silent,
+        )
+        return {str(row["repositoryId"]): row for row in res}
+
+    def fetch_commit_bounds(self):
+        self.logger.info("Fetching newest and oldest commit dates of repositories")
+        if not self.mysql_client.has_index(
+            table_name="commit", columns=COMMIT_BOUNDS_INDEX, silent=self.silent
+        ):
+            self.logger.warning(
+                f"no index on commit starting with {COMMIT_BOUNDS_INDEX}, the commit bounds query will scan the table, see README.md"
             )
-            if most_recent_commit and oldest_commit:
-                msg = f"Found the most recent commit at date {most_recent_commit[0]['committedDate']}. "
-                msg += f"Found the oldest commit at date {oldest_commit[0]['committedDate']}"
-            else:
-                msg = "No records of recent and oldest commits founded"
-            self.logger.info(msg)
-
-            # 2. Fetch commits
-            # 2.1 Fetch from start until most_recent_commit (if exists)
-            repo_name = str(repo["name"])
-            repo_tracked_branch_ref = str(repo["trackedBranchRef"])
-            repo_owner_name = str(repo["ownerLogin"])
-            self.commits[repo_id] = list()
+        self.commit_bounds = self.get_commit_bounds(
+            repo_ids=[str(repo["id"]) for repo in self.repos],
+            mysql_client=self.mysql_client,
+        )
+
+    def history_cursors(
+        self, repo: dict[str, object], mysql_client: MysqlClient
+    ) -> list[HistoryCursor]:
+        # 1. Look for the first and last commit we have of the repo in the table
+        repo_id = str(repo["id"])
+        self.logger.info(
+            f"Looking into db for most and least recent commits of {repo_id=}"
+        )
+        if self.commit_bounds is not None:
+            bounds = self.commit_bounds.get(repo_id)
+        else:
+            bounds = self.get_commit_bounds(
+                repo_ids=[repo_id], mysql_client=mysql_client
+            ).get(repo_id)
+        if bounds:
+            msg = f"Found the most recent commit at date {bounds['newest']}. "
+            msg += f"Found the oldest commit at date {bounds['oldest']}"
+        else:
+            msg = "No records of recent and oldest commits founded"
+        self.logger.info(msg)
+
+        # 2. Histories to fetch
+        # 2.1 From start until most_recent_commit (if exists)
+        most_recent_date = (
+            transform_datetime(
+                date=str(bounds["newest"]),
+                output_formt=DateTimeFormat.github,
+                input_format=DateTimeFormat.bp_co_long,
+            )
+            if bounds
+            else EPOCH
+        )
+        cursors = [HistoryCursor(repo=repo, since=most_recent_date)]
+
+        # 2.2 If oldes_commit exists and the root is not reached, until the root
+        repo_root_is_reached = str(repo["rootCommitIsReached"]) == "1"
+        if bounds and not repo_root_is_reached:
+            oldest_date = transform_datetime(
+                date=str(bounds["oldest"]),
+                output_formt=DateTimeFormat.github,
+                input_format=DateTimeFormat.bp_co_long,
+            )
+            cursors.append(HistoryCursor(repo=repo, until=oldest_date))
+        if self.checkpoint:
+            cursors = self.checkpoint.resume(repo=repo, cursors=cursors)
+        return cursors
+
+    def stop_on_known_pages(
+        self,
+        cursor: HistoryCursor,
+        commits: list[CommitRecord],
+        mysql_client: MysqlClient,
+    ):
+        """End a forward history once early_stop_pages pages in a row were
+        already in database.
+
+        Histories since a date re-download the boundary commit on every run,
+        as well as rebased or cherry-picked commits stored before, so without
+        this an up to date repository can still cost several pages.
+        """
+        if (
+            not self.early_stop_pages
+            or not cursor.has_next_page
+            or not cursor.since
+            or cursor.since == EPOCH
+            or not commits
+        ):
+            return
+        known = mysql_client.existing_ids(
+            table_name="commit",
+            ids=[commit.id for commit in commits],
+            chunk_size=EXISTENCE_CHECK_CHUNK_SIZE,
+            silent=self.silent,
+        )
+        if len(known) < len(commits) * self.early_stop_known_ratio:
+            cursor.known_pages = 0
+            return
+        cursor.known_pages += 1
+        if cursor.known_pages >= self.early_stop_pages:
             self.logger.info(
-                f"starting fetching of branch ref {repo_tracked_branch_ref} of {repo_name=}, {repo_owner_name=}"
+                f"Stopping history of {cursor.repo_id=} since {cursor.since}, its last {cursor.known_pages} pages were already in database"
             )
+            cursor.has_next_page = False
 
-            most_recent_date = (
-                transform_datetime(
-                    date=str(most_recent_commit[0]["committedDate"]),
-                    output_formt=DateTimeFormat.github,
-                    input_format=DateTimeFormat.bp_co_long,
-                )
-                if most_recent_commit
-                else "1970-01-01T00:00:00Z"
+    def finish_history(self, cursor: HistoryCursor):
+        # a resumed cursor must not be resumed again once exhausted, otherwise
+        # every later run would fetch its history again, but it must stay in
+        # the checkpoint until its commits are inserted by store_commits. In
+        # streaming mode work_streaming clears it with its last inserted page
+        if self.checkpoint and not self.streaming and not cursor.has_next_page:
+            with self.finished_cursors_lock:
+                self.finished_cursors.append(cursor)
+
+    def clear_finished_histories(self):
+        if not self.checkpoint:
+            return
+        with self.finished_cursors_lock:
+            for cursor in self.finished_cursors:
+                self.checkpoint.clear(cursor)
+            self.finished_cursors = list()
+
+    def fetch_repo_commits(
+        self,
+        repo: dict[str, object],
+        mysql_client: MysqlClient,
+        github_client: GithubClient,
+    ) -> list[CommitRecord]:
+        repo_commits: list[CommitRecord] = list()
+        for _, commits in self.iter_repo_pages(
+            repo=repo, mysql_client=mysql_client, github_client=github_client
+        ):
+            repo_commits.extend(commits)
+        return repo_commits
+
+    def iter_repo_pages(
+        self,
+        repo: dict[str, object],
+        mysql_client: MysqlClient,
+        github_client: GithubClient,
+    ) -> Iterator[tuple[HistoryCursor, list[CommitRecord]]]:
+        repo_id = str(repo["id"])
+        tot = 0
+        page_size = PageSize()
+        # time spent fetching, without the time the consumer takes between pages
+        start = time.perf_counter()
+        for cursor in self.history_cursors(repo=repo, mysql_client=mysql_client):
+            self.logger.info(
+                f"starting fetching of branch ref {cursor.ref} of {cursor.name=}, {cursor.owner_name=}, {cursor.since=}, {cursor.until=}"
             )
-            end_cursor = None
-            has_next_page = True
-            while has_next_page:
-                commits, end_cursor, has_next_page = self.get_next_commits(
-                    owner_name=repo_owner_name,
-                    name=repo_name,
-                    ref=repo_tracked_branch_ref,
-                    end_cursor=end_cursor,
-                    since=most_recent_date,
+            while cursor.has_next_page:
+                commits = self.get_next_commits_adaptive(
+                    github_client=github_client, page_size=page_size, cursor=cursor
+                )
+                self.stop_on_known_pages(
+                    cursor=cursor, commits=commits, mysql_client=mysql_client
                 )
                 self.logger.debug(
-                    f"found {len(commits)} commits, next request starting from {end_cursor=}. {has_next_page=}"
+                    "found %d commits, next request starting from cursor.end_cursor=%r. cursor.has_next_page=%r",
+                    len(commits),
+                    cursor.end_cursor,
+                    cursor.has_next_page,
                 )
-                self.commits[repo_id].extend(commits)
-            self.logger.info("Fetched until the most recent commit.")
-
-            # 2.2 If oldes_commit exists and the root is not reached, fetch until the root
-            repo_root_is_reached = str(repo["rootCommitIsReached"]) == "1"
-            if oldest_commit and not repo_root_is_reached:
-                oldest_date = transform_datetime(
-                    date=str(oldest_commit[0]["committedDate"]),
-                    output_formt=DateTimeFormat.github,
-                    input_format=DateTimeFormat.bp_co_long,
+                tot += len(commits)
+                self.metrics.add_duration(
+                    kind="repository", key=repo_id, seconds=time.perf_counter() - start
                 )
-                end_cursor = None
-                has_next_page = True
-                while has_next_page:
-                    commits, end_cursor, has_next_page = self.get_next_commits(
-                        owner_name=repo_owner_name,
-                        name=repo_name,
-                        ref=repo_tracked_branch_ref,
-                        end_cursor=end_cursor,
-                        until=oldest_date,
-                    )
-                    self.logger.debug(
-                        f"found {len(commits)} commits, next request starting from {end_cursor=}"
-                    )
-                    self.commits[repo_id].extend(commits)
-            self.logger.info("Fetched until root.")
+                yield cursor, commits
+                start = time.perf_counter()
+            self.finish_history(cursor)
             self.logger.info(
-                f"Fetched a total of {len(self.commits[repo_id])} commits."
+                "Fetched until the most recent commit."
+                if cursor.since
+                else "Fetched until root."
             )
+        self.logger.info(f"Fetched a total of {tot} commits for {repo_id=}.")
+        self.logger.info(
+            f"Fetched {page_size.pages} pages for {repo_id=}, {page_size.average_latency():.3f}s per page on average, "
+            f"page size reduced {page_size.shrinks} times"
+        )
 
     def extract_users(self):
         self.logger.info("Starting author and committer extraction")
         for repo_id in self.commits:
             self.logger.info(f"Starting author extraction on {repo_id=}")
             self.logger.info(f"Got {len(self.commits[repo_id])} commits")
-            for commit in self.commits[repo_id]:
-                author = commit["author"]
-                if isinstance(author, dict):
-                    user = author["user"]
-                    self.logger.debug(f"Found author with id: {user}")
-                    if user:
-                        self.github_users_id.add(user["id"])
-                committer = commit["committer"]
-                if isinstance(committer, dict):
-                    user = committer["user"]
-                    self.logger.debug(f"Found committer with id : {user}")
-                    if user:
-                        self.github_users_id.add(user["id"])
+            self.github_users_id.update(
+                self.extract_commit_users(self.commits[repo_id])
+            )
         self.logger.info("Author and committer extraction done")
+
+    def extract_commit_users(self, commits: list[CommitRecord]) -> set[str]:
+        users_id: set[str] = set()
+        debug = self.logger.isEnabledFor(DEBUG)
+        for commit in commits:
+            if commit.authorId:
+                if debug:
+                    self.logger.debug("Found author with id: %s", commit.authorId)
+                users_id.add(commit.authorId)
+            if commit.committerId:
+                if debug:
+                    self.logger.debug(
+                        "Found committer with id : %s", commit.committerId
+                    )
+                users_id.add(commit.committerId)
+        return users_id
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from _interface import GITHUB_TOKEN, DateTimeFormat
+
+REPOSITORY_PATTERN = re.compile(
+    r'(?:(\w+)\s*:\s*)?repository\(owner:\s*"([^"]*)",\s*name:\s*"([^"]*)"\)'
+)
+HISTORY_PATTERN = re.compile(
+    r'history\(first:\s*(\d+),\s*after:\s*(null|"[^"]*")(?:,\s*since:\s*"([^"]*)")?(?:,\s*until:\s*"([^"]*)")?\)'
+)
+NODES_PATTERN = re.compile(r"nodes\(ids:\s*\[([^\]]*)\]\)")
+RATE_LIMIT_PATTERN = re.compile(r"(\w+)\s*:\s*rateLimit\b")
+FIRST_COMMIT_DATE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+class SyntheticRepository:
+    """Linear history of size commits, one minute apart, the root being the
+    oldest, so that growing size only adds commits on top of the head."""
+
+    def __init__(self, owner: str, name: str, size: int, users: int = 50) -> None:
+        self.owner = owner
+        self.name = name
+        self.size = size
+        self.users = users
+
+    @property
+    def head_oid(self) -> str:
+        return hashlib.sha1(f"{self.name}-{self.size - 1}".encode()).hexdigest()
+
+    def commit_date(self, index: int) -> str:
+        date = FIRST_COMMIT_DATE + timedelta(minutes=index)
+        return date.strftime(DateTimeFormat.github)
+
+    def commit_node(self, index: int) -> dict:
+        author = {
+            "avatarUrl": f"https://avatars.example.com/{index % self.users}",
+            "email": f"user{index % self.users}@example.com",
+            "name": f"user {index % self.users}",
+            # a third of the commits come from git identities without Github user
+            "user": {"id": f"U{index % self.users}"} if index % 3 else None,
+        }
+        return {
+            "id": f"{self.name}-C{index}",
+            "additions": index % 100,
+            "deletions": index % 10,
+            "author": author,
+            "authoredDate": self.commit_date(index),
+            "committer": author,
+            "committedDate": self.commit_date(index),
+        }
+
+    def history(self, first: int, after: str | None, since: str, until: str) -> dict:
+        # newest first, as Github, since and until being inclusive
+        indexes = [
+            index
+            for index in range(self.size - 1, -1, -1)
+            if (not since or self.commit_date(index) >= since)
+            and (not until or self.commit_date(index) <= until)
+        ]
+        start = int(after) if after else 0
+        page = indexes[start : start + first]
+        return {
+            "pageInfo": {
+                "hasNextPage": start + len(page) < len(indexes),
+                "endCursor": str(start + len(page)),
+            },
+            "nodes": [self.commit_node(index) for index in page],
+        }
+
+
+class FakeGithubServer:
+    """Local HTTP stand-in for the Github GraphQL API.
+
+    Answers the queries of CommitsFetcher (repository histories, head commits
+    and user lookups, aliased or not) from synthetic repositories, after
+    latency seconds. With a cassette, requests are instead answered from the
+    recorded responses, and with record, forwarded to Github and appended to
+    the cassette.
+
+    Parameters
+    ----------
+    repositories : list[SyntheticRepository], optional
+        Repositories known to the server, by default none
+    latency : float, optional
+        Seconds waited before each answer, by default 0
+    cassette : str | None, optional
+        Path of a JSON lines file of {"query", "status", "body"} records, by default None
+    record : bool, optional
+        If True, forward the requests to Github and record them in cassette,
+        by default False
+    """
+
+    def __init__(
+        self,
+        repositories: list[SyntheticRepository] = list(),
+        latency: float = 0.0,
+        cassette: str | None = None,
+        record: bool = False,
+    ) -> None:
+        if record and not cassette:
+            raise ValueError("a cassette path is needed to record")
+        self.repositories = {(repo.owner, repo.name): repo for repo in repositories}
+        self.latency = latency
+        self.cassette = cassette
+        self.record = record
+        self.recorded: dict[str, tuple[int, str]] = dict()
+        if cassette and not record:
+            with open(cassette) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.recorded[self.cassette_key(entry["query"])] = (
+                        entry["status"],
+                        entry["body"],
+                    )
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="fake_github", daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def __enter__(self) -> "FakeGithubServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def cassette_key(self, query: str) -> str:
+        return " ".join(query.split())
+
+    def handler_class(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length", 0))
+                query = json.loads(self.rfile.read(length))["query"]
+                status, body = fake.answer(query)
+                payload = body.encode()
+                with fake.lock:
+                    fake.requests += 1
+                    fake.bytes_sent += len(payload)
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                return
+
+        return Handler
+
+    def answer(self, query: str) -> tuple[int, str]:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.record:
+            return self.forward(query)
+        if self.cassette:
+            key = self.cassette_key(query)
+            if key not in self.recorded:
+                return 404, json.dumps({"message": "query not in cassette"})
+            return self.recorded[key]
+        return 200, json.dumps({"data": self.resolve(query)})
+
+    def forward(self, query: str) -> tuple[int, str]:
+        resp = requests.post(
+            url="https://api.github.com/graphql",
+            headers={"Authorization": f"token {GITHUB_TOKEN}"},
+            json={"query": query},
+        )
+        with self.lock:
+            with open(str(self.cassette), "a") as f:
+                entry = {"query": query, "status": resp.status_code, "body": resp.text}
+                f.write(json.dumps(entry) + "\n")
+        return resp.status_code, resp.text
+
+    def resolve(self, query: str) -> dict:
+        data: dict[str, object] = dict()
+        rate_limit = RATE_LIMIT_PATTERN.search(query)
+        if rate_limit:
+            reset_at = datetime.now(timezone.utc) + timedelta(hours=1)
+            data[rate_limit.group(1)] = {
+                "cost": 1,
+                "remaining": 5000,
+                "resetAt": reset_at.strftime(DateTimeFormat.github),
+                "limit": 5000,
+            }
+        nodes = NODES_PATTERN.search(query)
+        if nodes:
+            ids = re.findall(r'"([^"]*)"', nodes.group(1))
+            data["nodes"] = [
+                {
+                    "id": id,
+                    "avatarUrl": f"https://avatars.example.com/{id}",
+                    "email": f"{id}@example.com",
+                    "name": f"name {id}",
+                    "login": f"login{id}",
+                }
+                for id in ids
+            ]
+        matches = list(REPOSITORY_PATTERN.finditer(query))
+        for i, match in enumerate(matches):
+            alias, owner, name = match.groups()
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(query)
+            block = query[match.end() : end]
+            repo = self.repositories.get((owner, name))
+            if repo is None:
+                data[alias or "repository"] = None
+                continue
+            history = HISTORY_PATTERN.search(block)
+            if history:
+                first, after, since, until = history.groups()
+                target = {
+                    "history": repo.history(
+                        first=int(first),
+                        after=None if after == "null" else after.strip('"'),
+                        since=since or "",
+                        until=until or "",
+                    )
+                }
+            else:
+                target = {"oid": repo.head_oid}
+            data[alias or "repository"] = {"ref": {"target": target}}
+        return data
@@ -1,17 +1,61 @@
+import asyncio
 import traceback
 
-from _interface import GithubClient, MysqlClient
-from config import logger
-from core import CommitsFetcher
+from _interface import AsyncGithubClient, GithubClient, JobMetrics, MysqlClient
+from config import (
+    ASYNC_CONCURRENCY,
+    ASYNC_FETCH,
+    CHECKPOINT_PATH,
+    GITHUB_REQUEST_TIMEOUT,
+    HTTP2,
+    METRICS_TEXTFILE_PATH,
+    logger,
+)
+from core import CommitsFetcher, CursorCheckpoint
 
 
 def main() -> int:
     mysql_client = MysqlClient(logger=logger)
-    github_client = GithubClient(logger=logger)
+    github_client = GithubClient(logger=logger, timeout=GITHUB_REQUEST_TIMEOUT)
+    metrics = JobMetrics(job="fetchCommits")
     fetcher = CommitsFetcher(
-        logger=logger, mysql_client=mysql_client, github_client=github_client
+        logger=logger,
+        mysql_client=mysql_client,
+        github_client=github_client,
+        checkpoint=CursorCheckpoint(path=CHECKPOINT_PATH, logger=logger),
+        metrics=metrics,
     )
-    return fetcher.work()
+    try:
+        if ASYNC_FETCH:
+            inserted = asyncio.run(work_async(fetcher=fetcher))
+        else:
+            inserted = fetcher.work()
+        metrics.succeeded = True
+        return inserted
+    finally:
+        # also reported when the job fails, with succeeded left to False
+        fetcher.record_github_stats()
+        metrics.log(logger)
+        if METRICS_TEXTFILE_PATH:
+            metrics.write_prometheus(path=METRICS_TEXTFILE_PATH, logger=logger)
+
+
+async def work_async(fetcher: CommitsFetcher) -> int:
+    # created inside the running loop, which it is bound to
+    async with AsyncGithubClient(
+        logger=logger,
+        token=fetcher.github_client.token,
+        rate_limiter=fetcher.github_client.rate_limiter,
+        max_retries=fetcher.github_client.max_retries,
+        backoff_base=fetcher.github_client.backoff_base,
+        backoff_max=fetcher.github_client.backoff_max,
+        timeout=fetcher.github_client.timeout,
+        max_concurrency=ASYNC_CONCURRENCY,
+        http2=HTTP2,
+        url=fetcher.github_client.url,
+        stats=fetcher.github_client.stats,
+    ) as github_client:
+        return await fetcher.work_async(github_client=github_client)
 
 
 if __name__ == "__main__":